@@ -0,0 +1,89 @@
+# Evaluations per second of the row-by-row, vectorized and batched fitness paths.
+# Run from the repository root: python -m benchmarks.evaluation [dataset]
+import random
+import sys
+from time import perf_counter
+
+import numpy as np
+
+import run
+from src.utils import fetch_dataset
+from src.gp import cache
+from deap.algorithms import varAnd
+
+# Split of every dataset, fixed so that numbers from different revisions are comparable
+SPLIT_SEED = 0
+
+
+def offspringSequence(toolbox, n, generations):
+    # The offspring of successive generations, as eaSimple would hand them to evaluation.
+    pop = toolbox.population(n=n)
+    sequence = [pop]
+    for _ in range(generations):
+        pop = varAnd(pop, toolbox, 0.5, 0.1)
+        sequence.append([ind for ind in pop if not ind.fitness.valid])
+        for ind in sequence[-1]:
+            ind.fitness.values = (0, 0, 0)
+    return sequence
+
+
+def measure(label, evaluate, sequence, setup=lambda: None):
+    setup()
+    n_evals = sum(len(invalid) for invalid in sequence)
+    start = perf_counter()
+    for invalid in sequence:
+        evaluate(invalid)
+    elapsed = perf_counter() - start
+    print('%-24s %10.1f evals/s' % (label, n_evals / elapsed))
+
+
+def main(dataset='ionosphere', n=300, generations=20):
+    random.seed(0)
+    np.random.seed(0)
+    run.X_train, run.X_test, run.y_train, run.y_test = fetch_dataset.load_dataset(dataset, SPLIT_SEED)
+    run.opaque_model_prediction_train = np.asarray(run.y_train)
+    toolbox = run.setUpGP(len(run.X_train[0]), run.fitness_function, run.fitness_population)
+    sequence = offspringSequence(toolbox, n, generations)
+    print('%s: %d generations, mean size %.1f' % (dataset, len(sequence),
+                                                   np.mean([len(i) for i in sequence[-1]])))
+
+    def caches(fitness, subtree):
+        run.fitness_cache = cache.FitnessCache(max_entries=200000) if fitness else None
+        run.subtree_cache = cache.SubtreeCache(max_bytes=256 * 1024 * 1024) if subtree else None
+
+    def evaluateEach(invalid):
+        return [run.fitness_function(ind) for ind in invalid]
+
+    run.vectorized_evaluation = False
+    measure('scalar', evaluateEach, sequence, lambda: caches(False, False))
+    run.vectorized_evaluation = True
+    measure('vectorized', evaluateEach, sequence, lambda: caches(False, False))
+    run.simplify_trees = False
+    measure('batched', run.fitness_population, sequence, lambda: caches(False, False))
+    run.simplify_trees = True
+    measure('batched+simplify', run.fitness_population, sequence, lambda: caches(False, False))
+    run.simplify_trees = False
+    measure('batched+fitness cache', run.fitness_population, sequence, lambda: caches(True, False))
+    measure('batched+both caches', run.fitness_population, sequence, lambda: caches(True, True))
+    run.simplify_trees = True
+    measure('batched+simplify+fitness', run.fitness_population, sequence, lambda: caches(True, False))
+    run.simplify_trees = False
+
+    # Tree evaluation alone, without the objective computation.
+    def predictEach(invalid):
+        return [run.predictIndividual(ind, run.X_train, run.subtree_cache) for ind in invalid]
+
+    def predictBatch(invalid):
+        return toolbox.predictPopulation(invalid, run.X_train, subtree_cache=run.subtree_cache)
+
+    run.vectorized_evaluation = False
+    measure('predict/scalar', predictEach, sequence, lambda: caches(False, False))
+    run.vectorized_evaluation = True
+    measure('predict/vectorized', predictEach, sequence, lambda: caches(False, False))
+    measure('predict/vectorized+subtree', predictEach, sequence, lambda: caches(False, True))
+    measure('predict/batched', predictBatch, sequence, lambda: caches(False, False))
+    measure('predict/batched+subtree', predictBatch, sequence, lambda: caches(False, True))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
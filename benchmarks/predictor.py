@@ -0,0 +1,83 @@
+# Latency and throughput of an exported surrogate served with predictor.Predictor, next to the
+# scalar lambda of toolbox.compile and the opaque MLP it explains.
+# Run from the repository root: python -m benchmarks.predictor [dataset]
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+from time import perf_counter
+
+import numpy as np
+from sklearn.neural_network import MLPClassifier
+
+import run
+from src.gp import predictor
+from src.models.classifiers import mlp
+from src.utils import fetch_dataset
+
+BATCH_SIZES = [1, 32, 1024, 65536]
+
+
+def latencies(function, rows, repeats):
+    times = []
+    for i in range(repeats):
+        row = rows[i % len(rows)]
+        start = perf_counter()
+        function(row)
+        times.append(perf_counter() - start)
+    return np.percentile(times, [50, 99]) * 1e6
+
+
+def throughput(function, X, min_seconds=0.2):
+    calls = 0
+    start = perf_counter()
+    while perf_counter() - start < min_seconds:
+        function(X)
+        calls += 1
+    return calls * len(X) / (perf_counter() - start)
+
+
+def main(dataset='ionosphere'):
+    random.seed(0)
+    np.random.seed(0)
+    run.X_train, run.X_test, run.y_train, run.y_test = fetch_dataset.load_dataset(dataset, 0)
+    run.opaque_model_prediction_train = np.asarray(run.y_train)
+    run.opaque_model_prediction_test = np.asarray(run.y_test)
+    run.n_generations = 20
+    with contextlib.redirect_stdout(io.StringIO()):
+        individual = run.executeGeneticProgramming()[0][1]
+
+    path = os.path.join(tempfile.mkdtemp(), 'surrogate.json')
+    run.toolbox.export(individual, path)
+    surrogate = predictor.load(path)
+    X = np.asarray(run.X_test)
+    assert np.array_equal(surrogate.predict(X), run.predictIndividual(individual, X))
+    print('%s: %s (%d nodes)' % (dataset, surrogate.expression, len(individual)))
+
+    func = run.toolbox.compile(expr=individual)
+    classifier = MLPClassifier(**dict(mlp.HYPERPARAMETERS, random_state=0)).fit(run.X_train, run.y_train)
+    servers = [
+        ('predictor', surrogate.predict),
+        ('toolbox.compile', lambda batch: np.array([int(func(*row) > 0.5) for row in batch])),
+        ('mlp', classifier.predict),
+    ]
+
+    rows = [X[i:i + 1] for i in range(len(X))]
+    print('%-16s %12s %12s' % ('single row', 'p50 (us)', 'p99 (us)'))
+    for name, function in servers:
+        p50, p99 = latencies(function, rows, 5000)
+        print('%-16s %12.1f %12.1f' % (name, p50, p99))
+
+    print('%-16s' % 'rows/s' + ''.join('%14s' % ('batch ' + str(size)) for size in BATCH_SIZES))
+    for name, function in servers:
+        line = '%-16s' % name
+        for size in BATCH_SIZES:
+            batch = X[np.arange(size) % len(X)]
+            line += '%14.0f' % throughput(function, batch, 0.05 if name == 'toolbox.compile' and size > 1024 else 0.2)
+        print(line)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
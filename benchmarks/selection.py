@@ -0,0 +1,50 @@
+# Time of one NSGA-II selection step (k = population size, as in eaSimple) with deap's
+# selNSGA2 and the NumPy backend, over growing populations of GP-like fitnesses.
+# Run from the repository root: python -m benchmarks.selection [max deap population]
+import random
+import sys
+from time import perf_counter
+
+from deap import base, creator, tools
+
+from src.gp import selection
+
+SIZES = [300, 1000, 2000, 5000, 10000, 20000]
+
+
+def population(n):
+    # F1 scores on a coarse grid and small integer ari/complexity values, so fitnesses repeat
+    # and fronts are many, as in a GP population.
+    pop = []
+    for _ in range(n):
+        individual = creator.Individual()
+        individual.fitness.values = (round(random.random(), 2), random.randint(0, 60), random.randint(0, 30))
+        pop.append(individual)
+    return pop
+
+
+def measure(select, pop):
+    start = perf_counter()
+    chosen = select(pop, len(pop))
+    return perf_counter() - start, chosen
+
+
+def main(max_deap=5000):
+    creator.create("FitnessMulti", base.Fitness, weights=(1.0, -1.0, -1.0))
+    creator.create("Individual", list, fitness=creator.FitnessMulti)
+
+    print('%8s %12s %12s %8s' % ('n', 'deap (s)', 'numpy (s)', 'same'))
+    for n in SIZES:
+        random.seed(n)
+        pop = population(n)
+        fast_time, fast = measure(selection.selNSGA2, pop)
+        if n <= max_deap:
+            deap_time, reference = measure(tools.selNSGA2, pop)
+            same = all(a is b for a, b in zip(reference, fast))
+            print('%8d %12.3f %12.3f %8s' % (n, deap_time, fast_time, same))
+        else:
+            print('%8d %12s %12.3f %8s' % (n, '-', fast_time, '-'))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,88 @@
+# Fixed-seed, reduced-size GP runs over the bundled datasets, for comparing revisions. Each
+# workload runs in a freshly spawned process so its peak memory is its own; peak_rss_mb includes
+# the imports, workload_rss_mb is the growth over the workload alone. Needs no network: the
+# datasets are read from src/utils and scikit-learn, and the opaque labels are the true ones.
+# Run from the repository root: python -m benchmarks.suite [output.json]
+import contextlib
+import io
+import json
+import multiprocessing
+import platform
+import random
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+
+import numpy as np
+
+import run
+from src.gp import streaming
+from src.utils import fetch_dataset
+
+DATASETS = ['ionosphere', 'banknotes', 'breast_cancer', 'digits1_7', 'digits3_9']
+SETTINGS = dict(population_size=300, n_generations=20, split_seed=0, experiment_seed=0, repeats=3)
+
+
+def workload(dataset):
+    start_rss = streaming.peakRSS()
+    run.X_train, run.X_test, run.y_train, run.y_test = fetch_dataset.load_dataset(dataset, SETTINGS['split_seed'])
+    run.opaque_model_prediction_train = np.asarray(run.y_train)
+    run.opaque_model_prediction_test = np.asarray(run.y_test)
+    run.population_size = SETTINGS['population_size']
+    run.n_generations = SETTINGS['n_generations']
+
+    runs = []
+    for _ in range(SETTINGS['repeats']):
+        random.seed(SETTINGS['experiment_seed'])
+        np.random.seed(SETTINGS['experiment_seed'])
+        if run.fitness_cache is not None:
+            run.fitness_cache.clear()
+        start = perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = run.executeGeneticProgramming()[0]
+        elapsed = perf_counter() - start
+
+        generations = run.generation_logbook
+        evaluated = sum(generations.select('nevals'))
+        evaluation_time = sum(sum(generations.select(field)) for field in ('t_compile', 't_eval', 't_metrics'))
+        runs.append(dict(seconds=elapsed, evaluations=evaluated,
+                         evaluations_per_s=evaluated / evaluation_time if evaluation_time else 0.0,
+                         generation_seconds=statistics.median(generations.select('t_generation')[1:]),
+                         best_fscore=result[0], best_individual=str(result[1])))
+
+    # The fastest repeat, the least disturbed by the rest of the machine
+    fastest = min(runs, key=lambda r: r['seconds'])
+    return dict(fastest, dataset=dataset, n_train=len(run.X_train), n_features=len(run.X_train[0]),
+                seconds_all=[r['seconds'] for r in runs], peak_rss_mb=streaming.peakRSS(),
+                workload_rss_mb=streaming.peakRSS() - start_rss,
+                deterministic=len({(r['best_fscore'], r['best_individual']) for r in runs}) == 1)
+
+
+def revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(output='benchmark_results.json'):
+    results = []
+    for dataset in DATASETS:
+        # A spawned process per workload: a forked one would start from this process's ru_maxrss
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            result = pool.apply(workload, (dataset,))
+        results.append(result)
+        print('%-14s %8.2f s %10.1f evals/s %8.3f s/gen %8.1f MB peak %8.1f MB workload  f1 %.3f' % (
+            dataset, result['seconds'], result['evaluations_per_s'], result['generation_seconds'],
+            result['peak_rss_mb'], result['workload_rss_mb'], result['best_fscore']))
+
+    report = dict(revision=revision(), python=platform.python_version(), numpy=np.__version__,
+                  machine=platform.machine(), settings=SETTINGS, results=results)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print('Wrote ' + output)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
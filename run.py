@@ -1,6 +1,10 @@
+import atexit
+import hashlib
+import json
+import os
+import random
 import statistics
 
-import deap.gp
 import numpy
 import numpy as np
 from time import process_time
@@ -8,10 +12,28 @@ import sklearn.metrics
 
 from src.utils import fetch_dataset
 from src.models.classifiers import mlp
+from src.models.classifiers import decision_tree
+from src.utils import model_store
+from src.gp import evaluation
+from src.gp import evolution
+from src.gp import cache
+from src.gp import parallel
+from src.gp import tree
+from src.gp import metrics
+from src.gp import streaming
+from src.gp import selection
+from src.gp import archive
+from src.gp import checkpoint
+from src.gp import profiling
+from src.gp import stopping
+from src.gp import simplify
+from src.gp import predictor
+from src.gp import results
+from src.gp import islands
+from src.gp import service
 
 import operator
 
-from deap import algorithms
 from deap import gp
 from deap import creator, base, tools
 
@@ -28,6 +50,88 @@ time_end = 0
 mlp_classifier = None
 dataset_name = ''
 logbook = tools.Logbook()
+# Individuals per generation and generations per experiment.
+population_size = 300
+n_generations = 40
+# Budgeted runs: an experiment stops before it would exceed budget_seconds of wall time or
+# budget_evaluations evaluations, or once its convergence indicator ('hypervolume' of the
+# Pareto front or 'best_fscore') improved by at most stagnation_tolerance (relative) over the
+# last stagnation_generations generations. n_generations stays the upper bound; None disables each.
+budget_seconds = None
+budget_evaluations = None
+stagnation_generations = None
+stagnation_indicator = 'hypervolume'
+stagnation_tolerance = 1e-4
+# Evaluate the canonical simplified form of each tree (see simplify.simplify), which predicts
+# the same; the genotype and its size objectives are left as they are. Pays off when trees carry
+# much foldable or neutral structure; the bundled datasets' trees rarely shrink, and there the
+# rewrite costs about as much as the batched evaluation it saves.
+simplify_trees = False
+# Evaluate individuals over the whole feature matrix with NumPy instead of row by row.
+vectorized_evaluation = True
+# Evaluate all invalid individuals of a generation in one batch (requires vectorized_evaluation).
+batched_evaluation = True
+# Training F1 of evaluated trees, shared across generations and experiments of the same data split (None disables).
+fitness_cache = cache.FitnessCache(max_entries=200000, max_bytes=256 * 1024 * 1024)
+# Output vectors of training-set subtrees, so offspring only recompute what changed. Pays off with
+# large trees or many rows; on the bundled datasets its bookkeeping costs more than it saves.
+# e.g. subtree_cache = cache.SubtreeCache(max_bytes=256 * 1024 * 1024)
+subtree_cache = None
+# Number of worker processes for fitness evaluation; None or 1 evaluates in this process.
+evaluation_workers = None
+evaluation_pool = None
+shared_arrays = ()
+# Address (host, port) of a distributed evaluation service.Master replacing the evaluation pool;
+# None disables it. service_local_workers workers are started here as subprocesses and more can
+# join from other hosts (see src/gp/service.py). Workers load the split and the opaque model's
+# stored predictions themselves, so the service needs a split_seed and a shared .cache.
+service_address = None
+service_local_workers = 2
+# Rows per chunk when streaming X_train through evaluation (e.g. from a memory map); None evaluates it whole.
+streaming_chunk_rows = None
+stream_stats = streaming.StreamStats()
+# opaque_model_prediction_train packed for the popcount F1 kernel, see opaqueTrainLabels.
+packed_opaque_train = None
+# Worker processes running the independent experiments of generateReport; None or 1 runs them in turn.
+experiment_workers = None
+# Worker processes fitting the repeated MLP opaque models; None uses one per CPU.
+mlp_workers = None
+# Seed of the train/test split; with a seed the opaque model and its predictions are reused from model_store.
+split_seed = None
+# Classifier module used as the black box: 'mlp' or 'decision_tree'.
+opaque_model = 'mlp'
+# Experiment i is seeded with experiment_seed + i; None leaves the RNGs unseeded.
+experiment_seed = None
+# Directory of per-generation checkpoints and finished experiment results, so an interrupted
+# report resumes where it stopped; None disables checkpointing. Needs a split_seed, and results
+# are kept apart per runConfiguration.
+checkpoint_directory = None
+# Pareto front saved by an earlier report (pareto_results/<dataset>/pareto_front.json) whose
+# members seed the initial population; None starts from random individuals.
+warm_start_front = None
+# Checkpoint file of the running experiment and the process time it started at, set by runExperiment.
+checkpoint_path = None
+experiment_time_start = 0
+# Per-generation timing breakdown of the running experiment and its generation-by-generation logbook.
+generation_profile = None
+generation_logbook = None
+# Seconds of CPU time between samples of profiling.SamplingProfiler over generateReport; None disables it.
+sampling_interval = None
+# Island model: n_islands populations of population_size evolve at once in their own processes
+# and, every migration_interval generations, send their migration_size best individuals to the
+# islands after them in migration_topology ('ring' or 'complete') over localhost TCP. None
+# evolves a single population. Islands cannot be combined with experiment_workers > 1, as pool
+# workers cannot start processes of their own; checkSettings rejects it.
+n_islands = None
+migration_interval = 5
+migration_size = 5
+migration_topology = 'ring'
+# The islands.Island of this process while it evolves one island, set by runIsland.
+island = None
+# Worker processes rendering report charts and tree PDFs in the background, alongside the next
+# dataset or experiment; None renders them in this process.
+report_workers = 2
+report_pool = None
 
 
 def protectedDiv(left, right):
@@ -39,7 +143,7 @@ def protectedDiv(left, right):
         return 1
 
 
-def setUpGP(n_parameters: int, evaluate_function):
+def setUpGP(n_parameters: int, evaluate_function, evaluate_population_function=None):
     global toolbox
 
     pset = gp.PrimitiveSet("MAIN", n_parameters)
@@ -50,16 +154,27 @@ def setUpGP(n_parameters: int, evaluate_function):
     pset.renameArguments(ARG0='x', ARG1='y', ARG2='z', ARG3='t')
 
     creator.create("FitnessMulti", base.Fitness, weights=(1.0, -1.0, -1.0))
-    creator.create("Individual", gp.PrimitiveTree, fitness=creator.FitnessMulti)
+    creator.create("Individual", tree.CompactTree, fitness=creator.FitnessMulti)
+    creator.Individual.bind(pset, getComplexityFactor)
 
     toolbox = base.Toolbox()
     toolbox.register("expr", gp.genHalfAndHalf, pset=pset, min_=1, max_=2)
     toolbox.register("individual", tools.initIterate, creator.Individual, toolbox.expr)
     toolbox.register("population", tools.initRepeat, list, toolbox.individual)
     toolbox.register("compile", gp.compile, pset=pset)
+    toolbox.register("compileVectorized", evaluation.compile, pset=pset)
+    toolbox.register("predictPopulation", evaluation.predictPopulation, pset=pset)
+    toolbox.register("parse", creator.Individual.from_string, pset=pset)
+    toolbox.register("streamConfusion", streaming.confusionCounts, pset=pset)
+    toolbox.register("simplify", simplify.simplify, pset=pset)
+    toolbox.register("export", predictor.save, arguments=pset.arguments)
 
     toolbox.register("evaluate", evaluate_function)
-    toolbox.register("select", tools.selNSGA2)
+    if evaluation_pool is not None:
+        toolbox.register("map", evaluation_pool.map)
+    if evaluate_population_function is not None:
+        toolbox.register("evaluatePopulation", evaluate_population_function)
+    toolbox.register("select", selection.selNSGA2)
     toolbox.register("mate", gp.cxOnePoint)
     toolbox.register("expr_mut", gp.genFull, min_=0, max_=2)
     toolbox.register("mutate", gp.mutUniform, expr=toolbox.expr_mut, pset=pset)
@@ -72,32 +187,137 @@ def setUpGP(n_parameters: int, evaluate_function):
 
 def fitness_function(individual):
     # Evaluate fitness of an individual within a generation.
+    return calculateObjectives(individual, scoreExpressions([evaluationForm(individual)])[0])
+
+
+def fitness_population(individuals):
+    # Evaluate fitness of every invalid individual of a generation in one batch.
+    scores = scoreExpressions([evaluationForm(individual) for individual in individuals])
+    return [calculateObjectives(individual, f1) for individual, f1 in zip(individuals, scores)]
+
+
+def evaluationForm(individual):
+    # The tree actually evaluated: its canonical simplified form, or the genotype itself.
+    return toolbox.simplify(individual) if simplify_trees else individual
+
+
+def scoreExpressions(expressions):
+    # Training F1 of every expression. Expressions with the same cache key (the same
+    # canonical form when simplifying) are evaluated once, and at most once across generations.
+    if fitness_cache is None:
+        return computeScores(expressions)
+
+    keys = [fitness_cache.key(expression) for expression in expressions]
+    scores = {}
+    missing = {}
+    for key, expression in zip(keys, expressions):
+        if key not in scores and key not in missing:
+            score = fitness_cache.get(key)
+            if score is None:
+                missing[key] = expression
+            else:
+                scores[key] = score
+
+    if missing:
+        for key, score in zip(missing, computeScores(list(missing.values()))):
+            scores[key] = score
+            fitness_cache.put(key, score)
+
+    return [scores[key] for key in keys]
+
+
+def computeScores(expressions):
+    # Batch evaluation on the process pool when one is running, otherwise in this process.
+    if evaluation_pool is not None:
+        with profiling.phase(generation_profile, 'eval'):
+            return evaluation_pool.mapChunks(evaluateSerialized, [str(expression) for expression in expressions])
+
+    if streaming_chunk_rows is not None:
+        tp, fp, fn, tn = toolbox.streamConfusion(expressions, X_train, opaque_model_prediction_train,
+                                                 chunk_rows=streaming_chunk_rows, stats=stream_stats,
+                                                 profile=generation_profile)
+        with profiling.phase(generation_profile, 'metrics'):
+            return [float(f1) for f1 in metrics.f1FromCounts(tp, fp, fn)]
+
+    if vectorized_evaluation and batched_evaluation:
+        y_preds = toolbox.predictPopulation(expressions, X_train, subtree_cache=subtree_cache,
+                                            profile=generation_profile)
+    else:
+        y_preds = [predictIndividual(expression, X_train, subtree_cache, generation_profile)
+                   for expression in expressions]
+    with profiling.phase(generation_profile, 'metrics'):
+        return [float(f1) for f1 in metrics.f1Score(np.asarray(y_preds).reshape(len(expressions), -1),
+                                                    opaqueTrainLabels())]
+
+
+def opaqueTrainLabels():
+    # Packed once per label vector; repacked whenever opaque_model_prediction_train is replaced.
+    global packed_opaque_train
+    if packed_opaque_train is None or packed_opaque_train.source is not opaque_model_prediction_train:
+        packed_opaque_train = metrics.PackedLabels(opaque_model_prediction_train)
+    return packed_opaque_train
+
+
+def initEvaluationWorker(n_parameters, shared_X_train, shared_opaque_prediction_train):
+    # Worker processes read the training data from shared memory set up once by the pool.
+    global X_train, opaque_model_prediction_train, evaluation_pool, shared_arrays
+    shared_arrays = (shared_X_train, shared_opaque_prediction_train)
+    X_train = shared_X_train.attach()
+    opaque_model_prediction_train = shared_opaque_prediction_train.attach()
+    evaluation_pool = None
+    setUpGP(n_parameters, fitness_function, fitness_population)
+
+
+def initServiceWorker(dataset, seed, model):
+    # Evaluation service workers load the data split and the predictions trainOpaqueModel stored
+    # for it once, when they join.
+    global X_train, opaque_model_prediction_train, split_seed, opaque_model
+    split_seed, opaque_model = seed, model
+    X_train = fetch_dataset.load_dataset(dataset, split_seed)[0]
+    module = mlp if opaque_model == 'mlp' else decision_tree
+    stored = model_store.load(model_store.storeKey(dataset, split_seed, opaque_model, module.HYPERPARAMETERS))
+    if stored is None:
+        raise ValueError('No stored ' + opaque_model + ' for ' + dataset + ' with split seed ' + str(split_seed))
+    opaque_model_prediction_train = stored[1]
+    setUpGP(len(X_train[0]), fitness_function, fitness_population)
+
+
+def evaluateSerialized(expressions):
+    # Expressions travel to workers as prefix strings and are rebuilt with the worker's pset.
+    return computeScores([toolbox.parse(expression) for expression in expressions])
+
+
+def calculateObjectives(individual, f1_score):
     import math
-    func = toolbox.compile(expr=individual)
-    split_points = 0
-    countDivision = 0
-    countMult = 0
-    countPrimitive = 0
-    countTerminals = 0
-    complexity = 0
-    for i in individual.copy():
-        split_points += i.arity if type(i) == deap.gp.Primitive else 0
-        countPrimitive += 1 if type(i) == deap.gp.Primitive else 0
-        complexity += getComplexityFactor(i.name) if type(i) == deap.gp.Primitive else 0
-        countTerminals += 1 if type(i) == deap.gp.Terminal else 0
-        countDivision += 1 if type(i) == deap.gp.Primitive and i.name == 'protectedDiv' else 0
-        countMult += 1 if type(i) == deap.gp.Primitive and i.name == 'mul' else 0
-    y_pred = []
-
-    for x in enumerate(X_train):
-        function_result = int(func(*x[1]) > 0.5)
-        y_pred.append(function_result)
+    # Node counts and complexity are kept up to date by the tree itself
+    countPrimitive = individual.primitiveCount
+    countTerminals = individual.terminalCount
+    complexity = individual.complexity
 
     # avgTreeLength = individual.__len__() / split_points if split_points != 0 else 0
     ari = 1 / (1 + math.exp(-(countTerminals * countPrimitive)))
     complextTerminals = 1 / (1 + math.exp(-complexity))
 
-    return sklearn.metrics.f1_score(opaque_model_prediction_train, y_pred), ari, complextTerminals
+    return f1_score, ari, complextTerminals
+
+
+# Predicts the class of every row of X with the individual, vectorized or row by row.
+def predictIndividual(individual, X, subtree_cache=None, profile=None):
+    if vectorized_evaluation:
+        with profiling.phase(profile, 'compile'):
+            func = toolbox.compileVectorized(expr=individual, subtree_cache=subtree_cache)
+        with profiling.phase(profile, 'eval'):
+            return evaluation.predict(func, X)
+
+    with profiling.phase(profile, 'compile'):
+        func = toolbox.compile(expr=individual)
+    with profiling.phase(profile, 'eval'):
+        y_pred = []
+        for x in enumerate(X):
+            function_result = int(func(*x[1]) > 0.5)
+            y_pred.append(function_result)
+
+    return np.array(y_pred)
 
 
 def getComplexityFactor(primitive):
@@ -119,16 +339,14 @@ def calculateScore(individuals, pareto):
     f1_score_sum = 0
     hof_height_sum = []
     hof_node_sum = []
+    packed_opaque_test = metrics.PackedLabels(opaque_model_prediction_test)
 
     for i in individuals:
-        func = toolbox.compile(expr=i)
-        y_gp = []
-        for x in enumerate(X_test):
-            function_result = int(func(*list(x[1])) > 0.5)
-            y_gp.append(function_result)
-
-        gp_f1score = sklearn.metrics.f1_score(opaque_model_prediction_test, np.array(y_gp))
-        gp_accuracy_score = sklearn.metrics.accuracy_score(opaque_model_prediction_test, np.array(y_gp))
+        y_gp = predictIndividual(evaluationForm(i), X_test)
+
+        tp, fp, fn, tn = metrics.confusion(y_gp, packed_opaque_test)
+        gp_f1score = float(metrics.f1FromCounts(tp, fp, fn))
+        gp_accuracy_score = float(metrics.accuracyFromCounts(tp, tn, packed_opaque_test.n))
         hallOfFame.append((gp_f1score, i, gp_accuracy_score))
         f1_score_sum += gp_f1score
 
@@ -147,16 +365,7 @@ def calculateScore(individuals, pareto):
            pareto,
 
 
-def executeGeneticProgramming():
-    global X_train
-    global logbook
-    pareto = tools.ParetoFront()
-    generation = 40
-
-    toolbox = setUpGP(len(X_train[0]), fitness_function)
-
-    pop = toolbox.population(n=300)
-    hof = tools.HallOfFame(10)
+def populationStatistics():
     fscore_stats = tools.Statistics(lambda ind: ind.fitness.values[0])
     # avgTree_stats = tools.Statistics(lambda ind: ind.fitness.values[1])
     ari_stats = tools.Statistics(lambda ind: ind.fitness.values[1])
@@ -167,21 +376,246 @@ def executeGeneticProgramming():
     mstats.register("std", numpy.std)
     mstats.register("min", numpy.min)
     mstats.register("max", numpy.max)
+    return mstats
 
-    logbook.header = ["gen", "evals"] + mstats.fields
 
-    algorithms.eaSimple(pop, toolbox, 0.5, 0.1, generation, mstats, halloffame=hof, verbose=True)
-    pareto.update(pop)
+# Evolves one population in this process, migrating through island when this process runs one.
+# Returns the final population, the hall of fame, the Pareto archive and what ended the run, and
+# leaves the per-generation logbook in generation_logbook.
+def evolvePopulation():
+    global X_train
+    global experiment_time_start
+    global generation_profile, generation_logbook
+    pareto = archive.ParetoArchive()
+    generation = n_generations
+
+    toolbox = setUpGP(len(X_train[0]), fitness_function,
+                      fitness_population if vectorized_evaluation and batched_evaluation else None)
+
+    state = checkpoint.load(checkpoint_path) if checkpoint_path is not None else None
+    if state is not None:
+        # Resume after the last completed generation, with the RNGs as they were then
+        pop, hof, pareto = state['population'], state['halloffame'], state['pareto']
+        random.setstate(state['random_state'])
+        np.random.set_state(state['numpy_random_state'])
+        experiment_time_start = process_time() - state['elapsed']
+        print('Resuming from generation ' + str(state['generation']) + ' of ' + checkpoint_path)
+    elif warm_start_front is not None:
+        pop = checkpoint.seedPopulation(toolbox, population_size, checkpoint.loadFront(warm_start_front))
+        hof = tools.HallOfFame(10)
+    else:
+        pop = toolbox.population(n=population_size)
+        hof = tools.HallOfFame(10)
+    mstats = populationStatistics()
+
+    def saveCheckpoint(gen, population, evolution_logbook):
+        checkpoint.save(checkpoint_path, dict(generation=gen, population=population, halloffame=hof, pareto=pareto,
+                                              logbook=evolution_logbook, random_state=random.getstate(),
+                                              numpy_random_state=np.random.get_state(),
+                                              elapsed=process_time() - experiment_time_start))
+
+    generation_profile = profiling.GenerationProfile(dict(fitness_cache=fitness_cache, subtree_cache=subtree_cache))
+    budget = None
+    if budget_seconds is not None or budget_evaluations is not None or stagnation_generations is not None:
+        budget = stopping.Budget(pareto, budget_seconds, budget_evaluations, stagnation_generations,
+                                 stagnation_tolerance, stagnation_indicator)
+    _, generation_logbook = evolution.eaSimple(pop, toolbox, 0.5, 0.1, generation, mstats, halloffame=hof,
+                                               verbose=True, archive=pareto,
+                                               checkpoint=saveCheckpoint if checkpoint_path is not None else None,
+                                               start_gen=state['generation'] + 1 if state is not None else 0,
+                                               logbook=state['logbook'] if state is not None else None,
+                                               profile=generation_profile, stop=budget, migrate=island)
+    generation_profile = None
+
+    return pop, hof, pareto, budget.reason if budget is not None and budget.reason else 'generations'
+
+
+def runIsland(args):
+    # One island of evolveIslands, in a worker process: its own seed, no checkpoints, and
+    # migration through an islands.Island connected to the others.
+    global island, checkpoint_path
+    index, coordinator_address, authkey, seed = args
+    random.seed(seed)
+    np.random.seed(seed)
+    checkpoint_path = None
+    island = islands.Island(index, coordinator_address, authkey, migration_interval, migration_size)
+    try:
+        pop, hof, pareto, stopped_by = evolvePopulation()
+    finally:
+        island.close()
+        island = None
+    return pop, list(hof), pareto, stopped_by, generation_logbook
+
+
+# Evolves n_islands populations at once, one per worker process, and merges their final
+# populations, halls of fame and Pareto archives. generation_logbook gets every island's
+# generations, each record marked with its island.
+def evolveIslands():
+    global generation_logbook
+    # Individuals coming back from the islands need the creator classes in this process
+    setUpGP(len(X_train[0]), fitness_function)
+    coordinator = islands.Coordinator(n_islands, migration_topology)
+    seeds = [random.randrange(2 ** 32) for _ in range(n_islands)]
+    pool = parallel.WorkerPool(n_islands, initExperimentWorker,
+                               [X_train, X_test, y_test, opaque_model_prediction_test,
+                                opaque_model_prediction_train])
+    try:
+        pending = [pool.submit(runIsland, (index, coordinator.address, coordinator.authkey, seeds[index]))
+                   for index in range(n_islands)]
+
+        # Raises the error of the first island to fail, before the others time out waiting on it
+        def check():
+            for result in pending:
+                if result.ready() and not result.successful():
+                    result.get()
+
+        coordinator.serve(check)
+        while not all(result.ready() for result in pending):
+            check()
+            next(result for result in pending if not result.ready()).wait(1.0)
+        check()
+        outcomes = [result.get() for result in pending]
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.close()
+
+    pop, hof, pareto = [], tools.HallOfFame(10), archive.ParetoArchive()
+    generation_logbook = tools.Logbook()
+    for index, (island_pop, island_hof, island_pareto, _, island_generations) in enumerate(outcomes):
+        pop += island_pop
+        hof.update(island_hof)
+        pareto.merge(island_pareto)
+        evolution.mergeLogbook(generation_logbook, island_generations, island=index)
+    return pop, hof, pareto, ','.join(sorted({outcome[3] for outcome in outcomes}))
+
 
-    logbook.record(gen=generation, evals=len(pop), **mstats.compile(pop))
+def executeGeneticProgramming():
+    global logbook
+    # The cache lives across experiments, so this run's lookups are the change in its counters
+    cache_start = fitness_cache.stats() if fitness_cache is not None else dict(hits=0, misses=0)
+    if n_islands is not None and n_islands > 1 and island is None:
+        pop, hof, pareto, stopped_by = evolveIslands()
+    else:
+        pop, hof, pareto, stopped_by = evolvePopulation()
+
+    mstats = populationStatistics()
+    logbook.header = ["gen", "evals", "cache_hits", "cache_misses", "stream_rows_per_s", "peak_rss_mb",
+                      "stopped_by"] + mstats.fields
+    cache_stats = fitness_cache.stats() if fitness_cache is not None else dict(hits=0, misses=0)
+    logbook.record(gen=max(generation_logbook.select('gen')), evals=len(pop),
+                   cache_hits=cache_stats['hits'] - cache_start['hits'],
+                   cache_misses=cache_stats['misses'] - cache_start['misses'], stream_rows_per_s=stream_stats.throughput(),
+                   peak_rss_mb=streaming.peakRSS(), stopped_by=stopped_by, **mstats.compile(pop))
 
     return calculateScore(hof, pareto),
 
 
+# Settings that change what an experiment evolves, hashed into its checkpoint directory so a
+# rerun with other settings starts afresh instead of resuming or loading stale results.
+def runConfiguration():
+    module = mlp if opaque_model == 'mlp' else decision_tree
+    return dict(population_size=population_size, n_generations=n_generations, budget_seconds=budget_seconds,
+                budget_evaluations=budget_evaluations, stagnation_generations=stagnation_generations,
+                stagnation_indicator=stagnation_indicator, stagnation_tolerance=stagnation_tolerance,
+                opaque_model=opaque_model, opaque_hyperparameters=module.HYPERPARAMETERS,
+                warm_start_front=warm_start_front, n_islands=n_islands, migration_interval=migration_interval,
+                migration_size=migration_size, migration_topology=migration_topology)
+
+
+def runExperiment(index):
+    # One independent GP run with its own RNG seed, logbook and streaming counters. Returns the
+    # result, the final logbook record, the CPU time and the per-generation logbook. With a
+    # checkpoint_directory, a finished experiment is loaded instead of run again and an
+    # interrupted one resumes from its last generation.
+    global logbook, stream_stats, checkpoint_path, experiment_time_start
+    seed = None if experiment_seed is None else experiment_seed + index
+    if checkpoint_directory is not None:
+        configuration = json.dumps(runConfiguration(), sort_keys=True, default=str)
+        run_name = dataset_name + '_split' + str(split_seed) + '_seed' + str(experiment_seed) + '_' + \
+            hashlib.sha1(configuration.encode()).hexdigest()[:12]
+        checkpoint_path = os.path.join(checkpoint_directory, run_name, 'experiment_' + str(index) + '.pkl')
+        # Unpickling stored individuals needs the creator classes
+        setUpGP(len(X_train[0]), fitness_function)
+        finished = checkpoint.load(checkpoint_path + '.result')
+        if finished is not None:
+            return finished
+
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+    logbook = tools.Logbook()
+    stream_stats = streaming.StreamStats()
+
+    experiment_time_start = process_time()
+    result = executeGeneticProgramming()[0]
+    time_end = process_time()
+
+    outcome = result, logbook, time_end - experiment_time_start, generation_logbook
+    if checkpoint_path is not None:
+        checkpoint.save(checkpoint_path + '.result', outcome)
+        checkpoint.remove(checkpoint_path)
+    return outcome
+
+
+def experimentRecord(index, result, experiment_logbook, experiment_time):
+    # Metrics and final population statistics of experiment index, as one flat row.
+    gp_fscore, gp_function, mlp_fscore, accuracy_score, mlp_accuracy, gp_height, gp_node, pareto_ = result
+    return list(evolution.flatRecords(
+        experiment_logbook, experiment=index, dataset=dataset_name, split_seed=split_seed,
+        seed=None if experiment_seed is None else experiment_seed + index, gp_fscore=gp_fscore,
+        gp_accuracy=accuracy_score, mlp_fscore=mlp_fscore, mlp_accuracy=mlp_accuracy, gp_height=gp_height,
+        gp_nodes=gp_node, seconds=experiment_time, expression=str(gp_function), pareto_size=len(pareto_)))[-1]
+
+
+def initExperimentWorker(shared_X_train, shared_X_test, shared_y_test, shared_opaque_prediction_test,
+                         shared_opaque_prediction_train):
+    # Experiment workers read the data split from shared memory and evaluate in-process.
+    global X_train, X_test, y_test, opaque_model_prediction_test, opaque_model_prediction_train
+    global evaluation_pool, shared_arrays
+    shared_arrays = (shared_X_train, shared_X_test, shared_y_test, shared_opaque_prediction_test,
+                     shared_opaque_prediction_train)
+    X_train, X_test, y_test, opaque_model_prediction_test, opaque_model_prediction_train = \
+        [shared.attach() for shared in shared_arrays]
+    evaluation_pool = None
+
+
+def runExperiments(n_experiments):
+    # Runs the experiments serially or on experiment_workers processes. Results come back one
+    # at a time in experiment order, so the same seeds give the same report whatever the worker
+    # count and finished experiments need not be kept.
+    if experiment_workers is None or experiment_workers <= 1:
+        for index in range(n_experiments):
+            yield runExperiment(index)
+        return
+
+    # Individuals coming back from the workers need the creator classes in this process
+    setUpGP(len(X_train[0]), fitness_function)
+    pool = parallel.WorkerPool(experiment_workers, initExperimentWorker,
+                               [X_train, X_test, y_test, opaque_model_prediction_test,
+                                opaque_model_prediction_train])
+    try:
+        yield from pool.imap(runExperiment, range(n_experiments))
+    finally:
+        pool.close()
+
+
+# Raises ValueError for settings that cannot run together, before any work starts.
+def checkSettings():
+    if experiment_workers is not None and experiment_workers > 1 and n_islands is not None and n_islands > 1:
+        raise ValueError('n_islands > 1 cannot be combined with experiment_workers > 1: the islands of an '
+                         'experiment run in processes of their own, which experiment workers cannot start')
+    # Without a split seed every run draws a new split and opaque model, which checkpoints cannot resume against
+    if checkpoint_directory is not None and split_seed is None:
+        raise ValueError('Checkpointing needs a split_seed, so that a resumed run evaluates the same split')
+
+
 def generateReport(n_experiments, best_pareto=None):
     import pandas as pd
     global logbook
     global dataset_name
+    checkSettings()
 
     gp_fscore_sum = []
     gp_accuracy_sum = []
@@ -196,15 +630,22 @@ def generateReport(n_experiments, best_pareto=None):
     gp_sum_time = 0
     dt_sum_time = 0
     best_pareto
-    accumulatedPareto = []
-    for i in range(0, n_experiments):
-        time_start = process_time()
-        gp_fscore, gp_function, mlp_fscore, accuracy_score, mlp_accuracy, gp_height, gp_node, pareto_ = \
-            executeGeneticProgramming()[0]
-        time_end = process_time()
-        gp_sum_time += time_end - time_start
-
-        accumulatedPareto.append(pareto_)
+    # Non-dominated individuals over all experiments
+    global_pareto = archive.ParetoArchive()
+    report_logbook = tools.Logbook()
+    # Each experiment's metrics, generations and Pareto members, appended as it finishes
+    store = "pareto_results/" + dataset_name + "/results"
+    results.clear(store)
+    experiments = runExperiments(n_experiments)
+    for index, (result, experiment_logbook, experiment_time, experiment_generations) in enumerate(experiments):
+        gp_fscore, gp_function, mlp_fscore, accuracy_score, mlp_accuracy, gp_height, gp_node, pareto_ = result
+        gp_sum_time += experiment_time
+        evolution.mergeLogbook(report_logbook, experiment_logbook)
+
+        results.append(store, 'experiments', [experimentRecord(index, result, experiment_logbook, experiment_time)])
+        results.append(store, 'generations', evolution.flatRecords(experiment_generations, experiment=index))
+        results.append(store, 'pareto', results.paretoRows(pareto_, experiment=index))
+        global_pareto.merge(pareto_)
 
         mlp_fscore_sum.append(mlp_fscore)
         mlp_accuracy_sum.append(mlp_accuracy)
@@ -216,13 +657,19 @@ def generateReport(n_experiments, best_pareto=None):
 
         if gp_fscore > best_gp_fscore:
             best_gp_fscore = gp_fscore
+            best_gp_function = gp_function
             best_pareto = pareto_
 
+    logbook = report_logbook
+    results.writeCSV(store, 'generations', "pareto_results/" + dataset_name + "/generations.csv")
+    # Seeds later runs on this dataset through warm_start_front
+    checkpoint.saveFront("pareto_results/" + dataset_name + "/pareto_front.json", global_pareto)
+    # The best surrogate, loadable with predictor.load without DEAP
+    if best_gp_function is not None:
+        toolbox.export(best_gp_function, "pareto_results/" + dataset_name + "/surrogate.json", dataset=dataset_name,
+                       test_fscore=best_gp_fscore, split_seed=split_seed)
     fit_max = logbook.chapters["fscore_stats"].select("max")
 
-    import matplotlib.pyplot as plt
-    import seaborn as sns
-    sns.set()
     fit_max_whats_inside = [0.8635875402792695, 0.9001029866117405, 0.8635875402792695, 0.8013300083125521,
                             0.8320855614973262, 0.8400392541707556, 0.8626198083067093, 0.8320855614973262,
                             0.9134808853118711, 0.8320855614973262, 0.8320855614973262, 0.8253119429590018,
@@ -243,14 +690,10 @@ def generateReport(n_experiments, best_pareto=None):
                    0.7706855791962175, 0.7706855791962175, 0.8244111349036403, 0.8194130925507901, 0.7706855791962175,
                    0.8307045215562566, 0.655072463768116, 0.8008342022940564, 0.8152059134107709, 0.8645720476706391,
                    0.831389183457052, 0.8645720476706391, 0.7706855791962175, 0.7882882882882882, 0.7713950762016412]
-    fig, ax1 = plt.subplots()
-    ax1.set_ylabel("F1-Score")
     df = pd.DataFrame.from_dict(data=dict(remo_gp=fit_max, ferreira_et_al=fit_max_gpx, evans_et_al=fit_max_whats_inside,
                                           bojarczuk_et_al=fit_max_const), orient='index').T
     print(df)
-    ax = sns.stripplot(data=df)
-    ax.set_ylim(0.6, 1)
-    plt.savefig("pareto_results/" + dataset_name + "/fscore.png")
+    submitReport(drawFScoreChart, "pareto_results/" + dataset_name + "/fscore.png", df)
 
     results_log = [{
         'mlp_fscore': sum(mlp_fscore_sum) / n_experiments,
@@ -258,27 +701,61 @@ def generateReport(n_experiments, best_pareto=None):
         'gp_fscore_avg': sum(gp_fscore_sum) / n_experiments,
         'gp_fscore_std': statistics.pstdev(gp_fscore_sum),
         'total_pareto': best_pareto.items.__len__(),
+        'total_global_pareto': len(global_pareto),
         'fit_max': fit_max
     }]
     df_logbook = pd.DataFrame(results_log)
     df_logbook.to_csv("pareto_results/" + dataset_name + "/results.csv")
-    # generateParetoCharts(accumulatedPareto)
+    # generateParetoCharts([member['values'] for member in results.read(store, 'pareto')])
     # generateTree(best_pareto)
 
 
-def generateParetoCharts(paretos):
+# Hands a rendering task to the background report pool, started on first use. The pool is
+# closed at exit at the latest, so callers of main() never lose pending charts.
+def submitReport(func, *args):
+    global report_pool
+    if report_pool is None:
+        report_pool = parallel.BackgroundPool(report_workers)
+        atexit.register(closeReports)
+    report_pool.submit(func, *args)
+
+
+# Waits for the charts and trees still rendering and re-raises a rendering error.
+def closeReports():
+    global report_pool
+    if report_pool is not None:
+        pool, report_pool = report_pool, None
+        pool.close()
+
+
+def drawFScoreChart(path, df):
     import matplotlib.pyplot as plt
+    import seaborn as sns
+    sns.set()
+    fig, ax1 = plt.subplots()
+    ax1.set_ylabel("F1-Score")
+    ax = sns.stripplot(data=df, ax=ax1)
+    ax.set_ylim(0.6, 1)
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def generateParetoCharts(values):
     global dataset_name
 
     fscoreData = []
     ariData = []
     complexTermData = []
-    for p in paretos:
-        for i in p.items:
-            fscore, ari, complexTerminals = fitness_function(i)
-            fscoreData.append(fscore)
-            ariData.append(ari)
-            complexTermData.append(complexTerminals)
+    # Objective vectors of the Pareto members as stored, nothing is evaluated again
+    for fscore, ari, complexTerminals in values:
+        fscoreData.append(fscore)
+        ariData.append(ari)
+        complexTermData.append(complexTerminals)
+    submitReport(drawParetoCharts, "pareto_results/" + dataset_name, fscoreData, ariData, complexTermData)
+
+
+def drawParetoCharts(directory, fscoreData, ariData, complexTermData):
+    import matplotlib.pyplot as plt
 
     # fig = plt.figure()
     # ax = fig.add_subplot(111, projection='3d')
@@ -350,7 +827,8 @@ def generateParetoCharts(paretos):
             title='')
     ax1.grid()
 
-    fig1.savefig("pareto_results/" + dataset_name + "/compare_ari.png")
+    fig1.savefig(directory + "/compare_ari.png")
+    plt.close(fig1)
 
     fig2, ax2 = plt.subplots()
     line1, = ax2.plot(data_gpx_split, data_gpx_fscore, 'ro', label='gpx')
@@ -361,7 +839,8 @@ def generateParetoCharts(paretos):
             title='')
     ax2.grid()
 
-    fig2.savefig("pareto_results/" + dataset_name + "/compare_complex.png")
+    fig2.savefig(directory + "/compare_complex.png")
+    plt.close(fig2)
 
     fig3, ax3 = plt.subplots()
     line1, = ax3.plot(data_gpx_split, data_gpx_fscore, 'ro', label='gpx')
@@ -373,7 +852,8 @@ def generateParetoCharts(paretos):
             title='')
     ax3.grid()
 
-    fig3.savefig("pareto_results/" + dataset_name + "/compare_ari_complex.png")
+    fig3.savefig(directory + "/compare_ari_complex.png")
+    plt.close(fig3)
 
     # ax1.set(xlabel='automated readability index', ylabel='fscore',
     #         title='')
@@ -394,7 +874,6 @@ def generateParetoCharts(paretos):
 
 
 def generateTree(best_pareto):
-    import pygraphviz as pgv
     global dataset_name
     # nodes, edges, labels = gp.graph(best_gp_function)
     #
@@ -411,49 +890,97 @@ def generateTree(best_pareto):
 
     pareto_draw = sorted(best_pareto.items, key=lambda i: i.__len__())
 
-    for i_pareto in pareto_draw:
+    # Graphviz layouts run in parallel on the report pool, one task per tree
+    for index, i_pareto in enumerate(pareto_draw):
         nodes, edges, labels = gp.graph(i_pareto)
+        submitReport(drawTree, "pareto_results/" + dataset_name + "/tree_pareto_" + str(index) + ".pdf",
+                     nodes, edges, labels)
 
-        g = pgv.AGraph()
-        g.add_nodes_from(nodes)
-        g.add_edges_from(edges)
-        g.layout(prog="dot")
 
-        for i in nodes:
-            n = g.get_node(i)
-            n.attr["label"] = labels[i]
+def drawTree(path, nodes, edges, labels):
+    import pygraphviz as pgv
+    g = pgv.AGraph()
+    g.add_nodes_from(nodes)
+    g.add_edges_from(edges)
+    g.layout(prog="dot")
+
+    for i in nodes:
+        n = g.get_node(i)
+        n.attr["label"] = labels[i]
+
+    g.draw(path)
+
+
+def trainOpaqueModel(dataset):
+    # Trains the selected black box, or loads it and its predictions when the same dataset,
+    # split seed, model and hyperparameters were stored by an earlier run.
+    module = mlp if opaque_model == 'mlp' else decision_tree
+    key = None
+    if split_seed is not None:
+        key = model_store.storeKey(dataset, split_seed, opaque_model, module.HYPERPARAMETERS)
+        stored = model_store.load(key)
+        if stored is not None:
+            prediction_test, prediction_train, classifier, meta = stored
+            print('Loaded stored ' + opaque_model + ' for ' + dataset)
+            return prediction_test, prediction_train, classifier, meta['fit_time']
+
+    if opaque_model == 'mlp':
+        prediction_test, prediction_train, classifier, fit_time = mlp.createInstance(X_train, X_test, y_train, y_test,
+                                                                                    mlp_workers)
+    else:
+        time_start = process_time()
+        prediction_test, prediction_train, classifier = decision_tree.createInstance(X_train, X_test, y_train)
+        fit_time = process_time() - time_start
 
-        g.draw("pareto_results/" + dataset_name + "/tree_pareto_" + str(pareto_draw.index(i_pareto)) + ".pdf")
+    if key is not None:
+        model_store.save(key, prediction_test, prediction_train, classifier,
+                         dict(dataset=dataset, split_seed=split_seed, model_type=opaque_model,
+                              hyperparameters=module.HYPERPARAMETERS, fit_time=fit_time))
+    return prediction_test, prediction_train, classifier, fit_time
 
 
 def main(dataset):
     # Get global scope variables
     global X_train, X_test, y_train, y_test, toolbox, opaque_model_prediction_test, opaque_model_prediction_train, mlp_time
+    global evaluation_pool
+    checkSettings()
 
-    if dataset == 'ionosphere':
-        # Fetch dataset and set train/test variables
-        X_train, X_test, y_train, y_test = fetch_dataset.fetch_ionosphere()
-    elif dataset == 'breast_cancer':
-        # Fetch dataset and set train/test variables
-        X_train, X_test, y_train, y_test = fetch_dataset.fetch_breast_cancer()
-    elif dataset == 'digits1_7':
-        # Fetch dataset and set train/test variables
-        X_train, X_test, y_train, y_test = fetch_dataset.fetch_digits(1, 7)
-    elif dataset == 'digits3_9':
-        # Fetch dataset and set train/test variables
-        X_train, X_test, y_train, y_test = fetch_dataset.fetch_digits(3, 9)
-    elif dataset == 'wine':
-        # Fetch dataset and set train/test variables
-        X_train, X_test, y_train, y_test = fetch_dataset.fetch_wine()
-    elif dataset == 'banknotes':
-        # Fetch dataset and set train/test variables
-        X_train, X_test, y_train, y_test = fetch_dataset.fetch_banknotes()
+    # Fetch dataset and set train/test variables
+    X_train, X_test, y_train, y_test = fetch_dataset.load_dataset(dataset, split_seed)
 
-    # Execute blackbox algorithm
-    opaque_model_prediction_test, opaque_model_prediction_train, classifier, mlp_time = mlp.createInstance(X_train, X_test,
-                                                                                                           y_train, y_test)
+    # Cached fitness values and subtree outputs are only valid for the data split they were computed on
+    if fitness_cache is not None:
+        fitness_cache.clear()
+    if subtree_cache is not None:
+        subtree_cache.clear()
 
-    generateReport(n_experiments=30)
+    # Execute blackbox algorithm
+    opaque_model_prediction_test, opaque_model_prediction_train, classifier, mlp_time = trainOpaqueModel(dataset)
+
+    if service_address is not None:
+        if split_seed is None:
+            raise ValueError('The evaluation service needs a split_seed, so that its workers load the same split')
+        evaluation_pool = service.Master(service_address, initServiceWorker, (dataset, split_seed, opaque_model),
+                                         local_workers=service_local_workers)
+    elif evaluation_workers is not None and evaluation_workers > 1:
+        evaluation_pool = parallel.WorkerPool(evaluation_workers, initEvaluationWorker,
+                                              [X_train, opaque_model_prediction_train],
+                                              initargs=(len(X_train[0]),))
+    profiler = profiling.SamplingProfiler(sampling_interval) if sampling_interval is not None else None
+    if profiler is not None:
+        profiler.start()
+    try:
+        generateReport(n_experiments=30)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            with open("pareto_results/" + dataset + "/profile.txt", 'w') as f:
+                f.write(profiler.report())
+        if evaluation_pool is not None:
+            if isinstance(evaluation_pool, service.Master):
+                print(evaluation_pool.report())
+            evaluation_pool.close()
+            evaluation_pool = None
 
 
 if __name__ == '__main__':
@@ -519,6 +1046,8 @@ if __name__ == '__main__':
     # ax1.grid()
     #
     # fig1.savefig("pareto_results/" + dataset_name + "/breast_compare_ari.png")
+
+    closeReports()
     time_end = process_time()
 
     print(time_end - time_start)
@@ -0,0 +1,116 @@
+import copy
+import operator
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from src.gp import selection
+
+
+# Pareto front hall of fame kept in the order of deap.tools.ParetoFront (best weighted fitness
+# first, a newcomer before its equals) with the weighted and raw objective vectors of its
+# members alongside. Members are sorted by the first weighted objective, so a candidate is only
+# compared with the prefix that could dominate it and the suffix it could dominate, found by
+# bisection, and those comparisons are vectorized. Insertion stays linear in the archive size,
+# a deliberate simplification as the fronts evolved here hold tens of members: a staircase or
+# range tree over the other objectives would answer the dominance check in polylogarithmic time,
+# at the cost of an index to keep in step. The vectors live in buffers grown by doubling, so
+# keeping the order is one in-place move, and nothing is copied when no member is dominated.
+# Stored vectors let fronts be merged and charted without evaluating anything again.
+class ParetoArchive:
+    def __init__(self, similar=operator.eq):
+        self.similar = similar
+        self.items = []
+        # Negated weighted fitnesses, ascending, and their first objective, for bisection.
+        self.keys = []
+        self.firsts = []
+        # Weighted and raw objective vectors, the first len(items) rows in use.
+        self.wvalue_buffer = None
+        self.value_buffer = None
+
+    @property
+    def wvalues(self):
+        return None if self.wvalue_buffer is None else self.wvalue_buffer[:len(self.items)]
+
+    @property
+    def values(self):
+        return None if self.value_buffer is None else self.value_buffer[:len(self.items)]
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __reversed__(self):
+        return reversed(self.items)
+
+    def __str__(self):
+        return str(self.items)
+
+    # Adds the non-dominated individuals of population, as ParetoFront.update. Individuals
+    # dominated within the population could never stay in the archive, so only the population's
+    # own front is checked against it.
+    def update(self, population):
+        if not population:
+            return
+        W = np.array([ind.fitness.wvalues for ind in population], dtype=float)
+        for ind, count in zip(population, selection.dominationCounts(W)):
+            if count == 0:
+                self.insert(copy.deepcopy(ind), ind.fitness.wvalues, ind.fitness.values)
+
+    # Folds the members of another archive in, reusing their stored objective vectors.
+    def merge(self, other):
+        for item, wvalues, values in zip(other.items, other.wvalues if other.wvalues is not None else [],
+                                         other.values if other.values is not None else []):
+            self.insert(item, wvalues, values)
+        return self
+
+    # Inserts item unless a member dominates it or is an equal-fitness twin, removing the
+    # members it dominates. Returns whether it was inserted.
+    def insert(self, item, wvalues, values):
+        w = np.asarray(wvalues, dtype=float)
+        if self.wvalue_buffer is None:
+            self.wvalue_buffer = np.zeros((16, len(w)))
+            self.value_buffer = np.zeros((16, len(w)))
+        members = self.wvalues
+
+        # Members whose first weighted objective is at least the candidate's
+        head = members[:bisect_right(self.firsts, -w[0])]
+        better, worse = selection.compareBlock(head, w[None, :])
+        if (better & ~worse).any():
+            return False
+        for twin in np.flatnonzero(~better[:, 0] & ~worse[:, 0]):
+            if self.similar(item, self.items[twin]):
+                return False
+
+        # Members whose first weighted objective is at most the candidate's
+        start = bisect_left(self.firsts, -w[0])
+        better, worse = selection.compareBlock(w[None, :], members[start:])
+        dominated = better[0] & ~worse[0]
+        if dominated.any():
+            # The suffix is compacted in place, keeping the members the candidate does not dominate
+            kept = np.flatnonzero(~dominated)
+            n = start + len(kept)
+            for buffer in (self.wvalue_buffer, self.value_buffer):
+                buffer[start:n] = buffer[start + kept]
+            for members_list in (self.items, self.keys, self.firsts):
+                members_list[start:] = [members_list[start + index] for index in kept.tolist()]
+
+        n = len(self.items)
+        if n == len(self.wvalue_buffer):
+            self.wvalue_buffer = np.concatenate((self.wvalue_buffer, np.zeros_like(self.wvalue_buffer)))
+            self.value_buffer = np.concatenate((self.value_buffer, np.zeros_like(self.value_buffer)))
+
+        key = tuple(-w)
+        position = bisect_left(self.keys, key)
+        for buffer, row in ((self.wvalue_buffer, w), (self.value_buffer, np.asarray(values, dtype=float))):
+            buffer[position + 1:n + 1] = buffer[position:n]
+            buffer[position] = row
+        self.items.insert(position, item)
+        self.keys.insert(position, key)
+        self.firsts.insert(position, key[0])
+        return True
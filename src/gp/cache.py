@@ -0,0 +1,69 @@
+import sys
+from collections import OrderedDict
+
+
+# Least-recently-used mapping bounded by entry count and/or an approximate byte budget.
+class LRUCache:
+    def __init__(self, max_entries=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def sizeof(self, key, value):
+        return sys.getsizeof(key) + sys.getsizeof(value)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        size = self.sizeof(key, value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.nbytes -= self.entries.pop(key)[1]
+        self.entries[key] = (value, size)
+        self.nbytes += size
+        while (self.max_entries is not None and len(self.entries) > self.max_entries) or \
+                (self.max_bytes is not None and self.nbytes > self.max_bytes):
+            self.nbytes -= self.entries.popitem(last=False)[1][1]
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses, evictions=self.evictions,
+                    entries=len(self.entries), nbytes=self.nbytes)
+
+
+# Scores keyed by the prefix encoding of the tree, which identifies its structure: the code
+# array of a CompactTree, or the prefix string of any other tree (e.g. a simplified one).
+class FitnessCache(LRUCache):
+    def key(self, individual):
+        codes = getattr(individual, 'codes', None)
+        return codes.tobytes() if codes is not None else str(individual)
+
+
+# Output vectors of subtrees keyed by their prefix string, bounded by the bytes they hold.
+class SubtreeCache(LRUCache):
+    def sizeof(self, key, value):
+        return sys.getsizeof(key) + value.nbytes
@@ -0,0 +1,50 @@
+import json
+import os
+import pickle
+
+CHECKPOINT_DIRECTORY = './.cache/checkpoints'
+
+
+# Pickles state to path through a temporary file, so a crash mid-write leaves the previous
+# checkpoint in place.
+def save(path, state):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
+
+
+# The pickled state, or None without a checkpoint. Individuals need the creator classes
+# (see run.setUpGP) to exist before loading.
+def load(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+# Writes the expressions and objective values of a Pareto front, as text so it can seed runs
+# whatever the classes or pickling of the individuals.
+def saveFront(path, front):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    members = [dict(expression=str(individual), values=list(individual.fitness.values)) for individual in front]
+    with open(path + '.tmp', 'w') as f:
+        json.dump(members, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def loadFront(path):
+    with open(path) as f:
+        return [member['expression'] for member in json.load(f)]
+
+
+# A population of n individuals starting with the parsed expressions (at most n of them) and
+# filled up with new random individuals.
+def seedPopulation(toolbox, n, expressions):
+    population = [toolbox.parse(expression) for expression in expressions[:n]]
+    return population + toolbox.population(n=n - len(population))
@@ -0,0 +1,236 @@
+import numpy as np
+
+from deap import gp
+
+from src.gp import profiling
+
+
+# Vectorized counterpart of run.protectedDiv: zero denominators are replaced by 1.
+def protectedDiv(left, right):
+    right = np.where(right == 0, 1, right)
+    return left / right
+
+
+VECTORIZED_PRIMITIVES = {
+    'add': np.add,
+    'sub': np.subtract,
+    'mul': np.multiply,
+    'protectedDiv': protectedDiv,
+}
+
+
+def getVectorizedPrimitive(primitive, pset):
+    if primitive.name in VECTORIZED_PRIMITIVES:
+        return VECTORIZED_PRIMITIVES[primitive.name]
+    # Unknown primitives fall back to an element-wise call of the scalar function.
+    return np.frompyfunc(pset.context[primitive.name], primitive.arity, 1)
+
+
+def getTerminalValue(terminal, columns, arguments, pset):
+    if isinstance(terminal.value, str):
+        if terminal.value in arguments:
+            return columns[arguments[terminal.value]]
+        return pset.context[terminal.value]
+    return terminal.value
+
+
+# Child positions of every node of a prefix expression and a function giving the key of the
+# subtree rooted at a position. With fixed arities the space-joined node names of a subtree
+# identify it unambiguously, so equal subtrees share a key within and across trees.
+def analyzeTree(expr):
+    names = [node.name for node in expr]
+    children = [None] * len(expr)
+    ends = [None] * len(expr)
+    stack = []
+    for position in range(len(expr) - 1, -1, -1):
+        node = expr[position]
+        if isinstance(node, gp.Primitive):
+            children[position] = [stack.pop() for _ in range(node.arity)]
+            ends[position] = ends[children[position][-1]] if children[position] else position + 1
+        else:
+            children[position] = []
+            ends[position] = position + 1
+        stack.append(position)
+
+    return (lambda position: ' '.join(names[position:ends[position]])), children
+
+
+def asRowVector(value, n_rows):
+    return np.broadcast_to(np.asarray(value, dtype=float), (n_rows,))
+
+
+# Evaluates a prefix expression over every row of X at once, one NumPy op per node. With a
+# subtree_cache, subtrees whose output is already cached are not descended into, so an
+# offspring only recomputes the path from its modified node up to the root.
+def evaluateTree(expr, X, pset, subtree_cache=None):
+    columns = np.asarray(X, dtype=float).T
+    arguments = {name: index for index, name in enumerate(pset.arguments)}
+
+    if subtree_cache is not None:
+        key, children = analyzeTree(expr)
+
+        def value(position):
+            node = expr[position]
+            if not isinstance(node, gp.Primitive):
+                return getTerminalValue(node, columns, arguments, pset)
+            cached = subtree_cache.get(key(position))
+            if cached is None:
+                args = [value(child) for child in children[position]]
+                cached = asRowVector(getVectorizedPrimitive(node, pset)(*args), columns.shape[1])
+                subtree_cache.put(key(position), cached)
+            return cached
+
+        with np.errstate(all='ignore'):
+            return asRowVector(value(0), columns.shape[1])
+
+    stack = []
+    with np.errstate(all='ignore'):
+        for node in reversed(expr):
+            if isinstance(node, gp.Primitive):
+                args = [stack.pop() for _ in range(node.arity)]
+                stack.append(getVectorizedPrimitive(node, pset)(*args))
+            else:
+                stack.append(getTerminalValue(node, columns, arguments, pset))
+
+    return asRowVector(stack[0], columns.shape[1])
+
+
+# Drop-in replacement for gp.compile returning a function of the whole feature matrix.
+def compile(expr, pset, subtree_cache=None):
+    return lambda X: evaluateTree(expr, X, pset, subtree_cache)
+
+
+def predict(func, X):
+    return (func(X) > 0.5).astype(int)
+
+
+# Upper bound for the node-by-row buffer of evaluatePopulation; larger batches are split.
+POPULATION_BUFFER_BYTES = 256 * 1024 * 1024
+
+
+# Flattens a batch of prefix expressions into one node table. Argument terminals point
+# straight at the feature rows of the buffer, every other node gets a row of its own.
+# With a subtree_cache, identical subtrees within the batch share a row and subtrees found
+# in the cache become preloaded leaves instead of being expanded.
+class PopulationTable:
+    def __init__(self, pset, n_features, subtree_cache=None):
+        self.pset = pset
+        self.arguments = {name: index for index, name in enumerate(pset.arguments)}
+        self.subtree_cache = subtree_cache
+        self.n_rows = n_features
+        self.preloaded = []
+        self.computed = []
+        self.layers = {}
+        self.rows = {}
+        self.roots = []
+
+    def add(self, expr):
+        if self.subtree_cache is None:
+            self.roots.append(self.stack(expr))
+            return
+        key, children = analyzeTree(expr)
+        self.roots.append(self.emit(expr, key, children, 0)[0])
+
+    def allocate(self):
+        self.n_rows += 1
+        return self.n_rows - 1
+
+    def addPrimitive(self, node, operands):
+        layer = 1 + max(operand[1] for operand in operands)
+        if (layer, node.name) not in self.layers:
+            self.layers[(layer, node.name)] = (node, [], [])
+        row = self.allocate()
+        self.layers[(layer, node.name)][1].append(row)
+        self.layers[(layer, node.name)][2].append([operand[0] for operand in operands])
+        return row, layer
+
+    def addTerminal(self, node):
+        if isinstance(node.value, str) and node.value in self.arguments:
+            return self.arguments[node.value], 0
+        value = self.pset.context[node.value] if isinstance(node.value, str) else node.value
+        row = self.allocate()
+        self.preloaded.append((row, value))
+        return row, 0
+
+    # Plain postorder walk used without a cache: no keys, no sharing.
+    def stack(self, expr):
+        stack = []
+        for node in reversed(expr):
+            if isinstance(node, gp.Primitive):
+                stack.append(self.addPrimitive(node, [stack.pop() for _ in range(node.arity)]))
+            else:
+                stack.append(self.addTerminal(node))
+        return stack[0][0]
+
+    def emit(self, expr, subtree_key, children, position):
+        key = subtree_key(position)
+        if key in self.rows:
+            return self.rows[key]
+
+        node = expr[position]
+        if not isinstance(node, gp.Primitive):
+            self.rows[key] = self.addTerminal(node)
+            return self.rows[key]
+
+        cached = self.subtree_cache.get(key)
+        if cached is not None:
+            self.rows[key] = (self.allocate(), 0)
+            self.preloaded.append((self.rows[key][0], cached))
+            return self.rows[key]
+
+        operands = [self.emit(expr, subtree_key, children, child) for child in children[position]]
+        self.rows[key] = self.addPrimitive(node, operands)
+        self.computed.append((self.rows[key][0], key))
+        return self.rows[key]
+
+
+def evaluateBatch(individuals, columns, pset, subtree_cache=None, profile=None):
+    with profiling.phase(profile, 'compile'):
+        table = PopulationTable(pset, columns.shape[0], subtree_cache)
+        for individual in individuals:
+            table.add(individual)
+
+    with profiling.phase(profile, 'eval'):
+        values = np.empty((table.n_rows, columns.shape[1]))
+        values[:columns.shape[0]] = columns
+        for row, value in table.preloaded:
+            values[row] = value
+
+        # One array op per (layer, primitive): every add of layer 1 across the batch at once, etc.
+        with np.errstate(all='ignore'):
+            for layer, name in sorted(table.layers):
+                primitive, targets, children = table.layers[(layer, name)]
+                children = np.array(children)
+                op = getVectorizedPrimitive(primitive, pset)
+                values[targets] = op(*[values[children[:, i]] for i in range(primitive.arity)])
+
+        if subtree_cache is not None:
+            for row, key in table.computed:
+                subtree_cache.put(key, values[row].copy())
+
+    return values[table.roots]
+
+
+# Evaluates every individual of a batch over every row of X, grouping work by primitive and
+# layer. Returns an (individuals, rows) matrix equal to stacking evaluateTree results. With a
+# profiling.GenerationProfile, building the node tables counts as compile time.
+def evaluatePopulation(individuals, X, pset, subtree_cache=None, max_bytes=POPULATION_BUFFER_BYTES, profile=None):
+    columns = np.ascontiguousarray(np.asarray(X, dtype=float).T)
+    outputs = np.empty((len(individuals), columns.shape[1]))
+    row_bytes = columns.shape[1] * columns.itemsize
+
+    start = 0
+    while start < len(individuals):
+        end = start
+        n_nodes = columns.shape[0]
+        while end < len(individuals) and (end == start or (n_nodes + len(individuals[end])) * row_bytes <= max_bytes):
+            n_nodes += len(individuals[end])
+            end += 1
+        outputs[start:end] = evaluateBatch(individuals[start:end], columns, pset, subtree_cache, profile)
+        start = end
+
+    return outputs
+
+
+def predictPopulation(individuals, X, pset, subtree_cache=None, profile=None):
+    return (evaluatePopulation(individuals, X, pset, subtree_cache, profile=profile) > 0.5).astype(int)
@@ -0,0 +1,99 @@
+from deap import tools
+from deap.algorithms import varAnd
+
+from src.gp import profiling
+
+
+# Evaluates the individuals with an invalid fitness. A toolbox with evaluatePopulation gets
+# the whole batch in one call, otherwise toolbox.evaluate is mapped one individual at a time.
+def evaluateInvalid(population, toolbox):
+    invalid_ind = [ind for ind in population if not ind.fitness.valid]
+    if hasattr(toolbox, 'evaluatePopulation'):
+        fitnesses = toolbox.evaluatePopulation(invalid_ind) if invalid_ind else []
+    else:
+        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+    for ind, fit in zip(invalid_ind, fitnesses):
+        ind.fitness.values = fit
+
+    return invalid_ind
+
+
+# Same generational loop as deap.algorithms.eaSimple, evaluating through evaluateInvalid.
+# An archive (e.g. archive.ParetoArchive) is updated with every generation's population, and
+# checkpoint(gen, population, logbook) is called once each generation is complete. A run
+# resumed from the checkpoint of generation g passes start_gen=g + 1 and that logbook. With a
+# profiling.GenerationProfile, selection and variation are timed and every record gets the
+# profile's fields. stop(gen, population, logbook) returning True (e.g. a stopping.Budget) ends
+# the run after generation gen, before ngen is reached. migrate(gen, population, toolbox) (e.g.
+# an islands.Island) may replace members of each new population before the archive sees it.
+def eaSimple(population, toolbox, cxpb, mutpb, ngen, stats=None, halloffame=None, verbose=__debug__,
+             archive=None, checkpoint=None, start_gen=0, logbook=None, profile=None, stop=None, migrate=None):
+    if logbook is None:
+        logbook = tools.Logbook()
+        logbook.header = ['gen', 'nevals'] + (profile.fields if profile else []) + (stats.fields if stats else [])
+
+    if start_gen == 0:
+        invalid_ind = evaluateInvalid(population, toolbox)
+
+        if halloffame is not None:
+            halloffame.update(population)
+        if archive is not None:
+            archive.update(population)
+
+        record = stats.compile(population) if stats else {}
+        logbook.record(gen=0, nevals=len(invalid_ind), **(profile.collect(population) if profile else {}), **record)
+        if verbose:
+            print(logbook.stream)
+        if checkpoint is not None:
+            checkpoint(0, population, logbook)
+        if stop is not None and stop(0, population, logbook):
+            return population, logbook
+
+    for gen in range(max(start_gen, 1), ngen + 1):
+        with profiling.phase(profile, 'selection'):
+            offspring = toolbox.select(population, len(population))
+        with profiling.phase(profile, 'variation'):
+            offspring = varAnd(offspring, toolbox, cxpb, mutpb)
+
+        invalid_ind = evaluateInvalid(offspring, toolbox)
+
+        if halloffame is not None:
+            halloffame.update(offspring)
+
+        population[:] = offspring
+        if migrate is not None:
+            migrate(gen, population, toolbox)
+        if archive is not None:
+            archive.update(population)
+
+        record = stats.compile(population) if stats else {}
+        logbook.record(gen=gen, nevals=len(invalid_ind), **(profile.collect(population) if profile else {}), **record)
+        if verbose:
+            print(logbook.stream)
+        if checkpoint is not None:
+            checkpoint(gen, population, logbook)
+        if stop is not None and stop(gen, population, logbook):
+            break
+
+    return population, logbook
+
+
+# Appends every record of source, chapters included, to target in order, adding fields to each.
+def mergeLogbook(target, source, **fields):
+    if source.header is not None:
+        target.header = source.header
+    for index, record in enumerate(source):
+        chapters = {name: chapter[index] for name, chapter in source.chapters.items() if index < len(chapter)}
+        target.record(**dict(record, **chapters, **fields))
+    return target
+
+
+# Records of a logbook as flat dicts, chapter fields prefixed with the chapter name and fields
+# added to every record. Chapter records repeat the top-level fields, which are kept once.
+def flatRecords(logbook, **fields):
+    for index, record in enumerate(logbook):
+        row = dict(fields, **record)
+        for name, chapter in sorted(logbook.chapters.items()):
+            if index < len(chapter):
+                row.update((name + '_' + key, value) for key, value in chapter[index].items() if key not in record)
+        yield row
@@ -0,0 +1,155 @@
+import os
+import queue
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from time import perf_counter
+
+TOPOLOGIES = ('ring', 'complete')
+# Seconds the coordinator waits for all islands to register, and an island for its sources to connect
+CONNECT_TIMEOUT = 60.0
+
+
+# Islands that island index sends its migrants to: the next one around a ring, or all others.
+def neighbours(index, n_islands, topology):
+    if topology == 'ring':
+        return [(index + 1) % n_islands] if n_islands > 1 else []
+    if topology == 'complete':
+        return [other for other in range(n_islands) if other != index]
+    raise ValueError('Unknown migration topology ' + topology + ', expected ' + ' or '.join(TOPOLOGIES))
+
+
+# Accepts connections on listener in a thread, putting each with the first message it sends in
+# the returned queue, until the listener is closed.
+def acceptInto(listener):
+    accepted = queue.Queue()
+
+    def accept():
+        while True:
+            try:
+                connection = listener.accept()
+                accepted.put((connection, connection.recv()))
+            except AuthenticationError:
+                continue
+            except (OSError, EOFError):
+                return
+
+    threading.Thread(target=accept, daemon=True).start()
+    return accepted
+
+
+# Registry the islands of one run connect to at start. Once all n_islands have sent their own
+# migration address, each gets the addresses of the islands it sends to and the number it
+# receives from; after that the islands talk to each other directly.
+class Coordinator:
+    def __init__(self, n_islands, topology, host='localhost'):
+        neighbours(0, n_islands, topology)
+        self.n_islands = n_islands
+        self.topology = topology
+        self.authkey = os.urandom(16)
+        self.listener = Listener((host, 0), authkey=self.authkey)
+        self.address = self.listener.address
+
+    # check() is called about once a second while waiting, e.g. to raise the error of an island
+    # that failed before registering; RuntimeError if not all islands register within timeout.
+    def serve(self, check=None, timeout=CONNECT_TIMEOUT):
+        connections = {}
+        addresses = {}
+        accepted = acceptInto(self.listener)
+        start = perf_counter()
+        try:
+            while len(connections) < self.n_islands:
+                try:
+                    connection, (index, address) = accepted.get(timeout=1.0)
+                except queue.Empty:
+                    if check is not None:
+                        check()
+                    if perf_counter() - start > timeout:
+                        raise RuntimeError('Only ' + str(len(connections)) + ' of ' + str(self.n_islands) +
+                                           ' islands registered within ' + str(timeout) + ' s')
+                    continue
+                connections[index] = connection
+                addresses[index] = address
+            for index, connection in connections.items():
+                targets = neighbours(index, self.n_islands, self.topology)
+                sources = [other for other in range(self.n_islands)
+                           if index in neighbours(other, self.n_islands, self.topology)]
+                connection.send(([addresses[target] for target in targets], len(sources)))
+        finally:
+            for connection in connections.values():
+                connection.close()
+            self.listener.close()
+
+
+# Migration of one island, passed as migrate to evolution.eaSimple. Every interval generations
+# the island sends its size best individuals (toolbox.select, NSGA-II) with their fitness to
+# every neighbour, receives theirs and puts them in place of as many of its worst. Migration is
+# synchronous, so a run with fixed seeds is reproducible. A neighbour that has finished or
+# failed is dropped; close() tells the neighbours this island is done. Setting up fails with
+# RuntimeError if the islands sending to this one have not all connected within timeout.
+class Island:
+    def __init__(self, index, coordinator_address, authkey, interval, size, timeout=CONNECT_TIMEOUT):
+        self.index = index
+        self.interval = interval
+        self.size = size
+        self.incoming = {}
+        self.outgoing = []
+        listener = Listener((coordinator_address[0], 0), authkey=authkey)
+        try:
+            with Client(coordinator_address, authkey=authkey) as coordinator:
+                coordinator.send((index, listener.address))
+                targets, n_sources = coordinator.recv()
+
+            # Accepting runs alongside connecting, as every island does both at once
+            accepted = acceptInto(listener)
+            start = perf_counter()
+            for address in targets:
+                connection = Client(address, authkey=authkey)
+                connection.send(index)
+                self.outgoing.append(connection)
+            while len(self.incoming) < n_sources:
+                try:
+                    connection, source = accepted.get(timeout=max(0.0, timeout - (perf_counter() - start)))
+                except queue.Empty:
+                    raise RuntimeError('Island ' + str(index) + ': only ' + str(len(self.incoming)) + ' of ' +
+                                       str(n_sources) + ' source islands connected within ' + str(timeout) + ' s')
+                self.incoming[source] = connection
+        except BaseException:
+            self.close()
+            raise
+        finally:
+            listener.close()
+
+    def __call__(self, gen, population, toolbox):
+        if gen % self.interval != 0 or not (self.outgoing or self.incoming):
+            return
+
+        migrants = [(str(individual), individual.fitness.values) for individual in toolbox.select(population, self.size)]
+        for connection in list(self.outgoing):
+            try:
+                connection.send(migrants)
+            except OSError:
+                self.outgoing.remove(connection)
+                connection.close()
+
+        immigrants = []
+        for source in sorted(self.incoming):
+            try:
+                received = self.incoming[source].recv()
+            except (EOFError, OSError):
+                self.incoming.pop(source).close()
+                continue
+            for expression, values in received:
+                individual = toolbox.parse(expression)
+                individual.fitness.values = values
+                immigrants.append(individual)
+
+        if immigrants:
+            immigrants = immigrants[:len(population)]
+            population[:] = toolbox.select(population, len(population) - len(immigrants)) + immigrants
+
+    def close(self):
+        for connection in self.outgoing + list(self.incoming.values()):
+            connection.close()
+        self.outgoing = []
+        self.incoming = {}
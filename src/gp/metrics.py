@@ -0,0 +1,48 @@
+import numpy as np
+
+# Number of set bits of every byte value.
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(packed):
+    return POPCOUNT[packed].sum(axis=-1, dtype=np.int64)
+
+
+# Reference labels packed once, 8 rows per byte, with pos_label=1 as the set bit.
+class PackedLabels:
+    def __init__(self, labels):
+        self.source = labels
+        self.n = len(labels)
+        self.bits = np.packbits(np.asarray(labels) == 1)
+        self.positives = int(popcount(self.bits))
+
+
+# Confusion counts of one prediction vector, or of every row of a prediction matrix, against
+# the packed reference. Padding bits are zero in both, so they never count as a match.
+def confusion(y_pred, reference):
+    bits = np.packbits(np.asarray(y_pred) == 1, axis=-1)
+    tp = popcount(bits & reference.bits)
+    fp = popcount(bits & ~reference.bits)
+    fn = reference.positives - tp
+    tn = reference.n - tp - fp - fn
+    return tp, fp, fn, tn
+
+
+# Binary F1 as sklearn.metrics.f1_score computes it, 0.0 when there is no positive at all.
+def f1FromCounts(tp, fp, fn):
+    denominator = 2 * tp + fp + fn
+    return np.where(denominator > 0, 2 * tp / np.maximum(denominator, 1), 0.0)
+
+
+def accuracyFromCounts(tp, tn, n):
+    return (tp + tn) / n
+
+
+def f1Score(y_pred, reference):
+    tp, fp, fn, tn = confusion(y_pred, reference)
+    return f1FromCounts(tp, fp, fn)
+
+
+def accuracyScore(y_pred, reference):
+    tp, fp, fn, tn = confusion(y_pred, reference)
+    return accuracyFromCounts(tp, tn, reference.n)
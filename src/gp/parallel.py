@@ -0,0 +1,105 @@
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+
+# Picklable handle to an ndarray placed once in shared memory. Workers receive only the
+# segment name, shape and dtype, and attach to the same buffer without copying it.
+class SharedArray:
+    def __init__(self, array):
+        array = np.ascontiguousarray(array)
+        self.shape = array.shape
+        self.dtype = array.dtype.str
+        self.shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.name = self.shm.name
+        self.owner = True
+        self.attach()[...] = array
+
+    def __getstate__(self):
+        return dict(name=self.name, shape=self.shape, dtype=self.dtype)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.shm = None
+        self.owner = False
+
+    def attach(self):
+        if self.shm is None:
+            self.shm = shared_memory.SharedMemory(name=self.name)
+            # Only the creating process may unlink the segment; stop the tracker of this one doing it.
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    def release(self):
+        if self.shm is not None:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+            self.shm = None
+
+
+# Process pool kept alive across generations and experiments. Shared arrays are created
+# once here and handed to the initializer of every worker, never to individual tasks.
+class WorkerPool:
+    def __init__(self, n_workers, initializer, arrays, initargs=()):
+        self.n_workers = n_workers
+        self.shared = [SharedArray(array) for array in arrays]
+        self.pool = multiprocessing.Pool(n_workers, initializer, tuple(initargs) + tuple(self.shared))
+
+    def map(self, func, iterable):
+        return self.pool.map(func, iterable)
+
+    # Results in submission order while tasks are handed out one at a time to idle workers.
+    def imap(self, func, iterable):
+        return self.pool.imap(func, iterable, chunksize=1)
+
+    # Splits items into one contiguous chunk per worker and concatenates the per-chunk results.
+    def mapChunks(self, func, items):
+        if not items:
+            return []
+        size = -(-len(items) // self.n_workers)
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+        return [result for chunk in self.pool.map(func, chunks) for result in chunk]
+
+    # Runs func(*args) on the next idle worker and returns its multiprocessing AsyncResult.
+    def submit(self, func, *args):
+        return self.pool.apply_async(func, args)
+
+    # Stops the workers at once, dropping unfinished tasks; close() must still be called.
+    def terminate(self):
+        self.pool.terminate()
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        for array in self.shared:
+            array.release()
+
+
+# Pool for work nobody waits on, such as rendering report figures while the next dataset or
+# experiment runs. submit() returns at once; wait() blocks until everything submitted so far
+# is done and re-raises the first failure. With no workers, tasks run in this process on submit.
+class BackgroundPool:
+    def __init__(self, n_workers):
+        self.pool = multiprocessing.Pool(n_workers) if n_workers else None
+        self.pending = []
+
+    def submit(self, func, *args):
+        if self.pool is None:
+            func(*args)
+        else:
+            self.pending.append(self.pool.apply_async(func, args))
+
+    def wait(self):
+        pending, self.pending = self.pending, []
+        for result in pending:
+            result.get()
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
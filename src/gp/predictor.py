@@ -0,0 +1,103 @@
+# Standalone surrogate predictor: exports an evolved tree to JSON and evaluates it over NumPy
+# batches with nothing but NumPy, so serving code needs neither DEAP nor the run.py globals.
+import json
+import os
+
+import numpy as np
+
+FORMAT = 'gp-surrogate'
+VERSION = 1
+
+
+# Same as evaluation.protectedDiv: zero denominators are replaced by 1.
+def protectedDiv(left, right):
+    right = np.where(right == 0, 1, right)
+    return left / right
+
+
+OPERATORS = {
+    'add': np.add,
+    'sub': np.subtract,
+    'mul': np.multiply,
+    'protectedDiv': protectedDiv,
+}
+
+
+# Prefix tokens of a tree: {"op": name} for primitives, {"feature": column} for argument
+# terminals and {"constant": value} for numeric ones. Works on any sequence of DEAP nodes
+# without importing DEAP; arguments are the pset's argument names in column order.
+def tokens(expr, arguments):
+    columns = {name: index for index, name in enumerate(arguments)}
+    result = []
+    for node in expr:
+        if node.arity > 0:
+            if node.name not in OPERATORS:
+                raise ValueError('Primitive ' + node.name + ' cannot be exported')
+            result.append(dict(op=node.name))
+        elif isinstance(node.value, str) and node.value in columns:
+            result.append(dict(feature=columns[node.value]))
+        elif isinstance(node.value, (int, float)):
+            result.append(dict(constant=float(node.value)))
+        else:
+            raise ValueError('Terminal ' + node.name + ' cannot be exported')
+    return result
+
+
+def save(expr, path, arguments, **meta):
+    document = dict(format=FORMAT, version=VERSION, expression=str(expr), n_features=len(arguments),
+                    threshold=0.5, tokens=tokens(expr, arguments), meta=meta)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(document, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def load(path):
+    with open(path) as f:
+        document = json.load(f)
+    if document.get('format') != FORMAT or document.get('version') != VERSION:
+        raise ValueError(path + ' is not a version ' + str(VERSION) + ' ' + FORMAT + ' file')
+    return Predictor(document['tokens'], document['n_features'], document['threshold'], document.get('meta', {}),
+                     document.get('expression'))
+
+
+# A loaded surrogate. The prefix tokens are turned once into a postfix program of operators,
+# column indices and constants, so a call is one NumPy op per primitive over the whole batch.
+class Predictor:
+    def __init__(self, tokens, n_features, threshold=0.5, meta=None, expression=None):
+        self.n_features = n_features
+        self.threshold = threshold
+        self.meta = meta or {}
+        self.expression = expression
+        self.program = []
+        for token in reversed(tokens):
+            if 'op' in token:
+                self.program.append((0, OPERATORS[token['op']]))
+            elif 'feature' in token:
+                self.program.append((1, token['feature']))
+            else:
+                self.program.append((2, np.float64(token['constant'])))
+
+    # Output of the tree for every row of X, an (n_rows, n_features) array or a single row.
+    def evaluate(self, X):
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError('Expected ' + str(self.n_features) + ' features, got ' + str(X.shape[1]))
+
+        columns = X.T
+        stack = []
+        with np.errstate(all='ignore'):
+            for kind, value in self.program:
+                if kind == 0:
+                    left = stack.pop()
+                    stack.append(value(left, stack.pop()))
+                elif kind == 1:
+                    stack.append(columns[value])
+                else:
+                    stack.append(value)
+        return np.broadcast_to(stack[0], (X.shape[0],))
+
+    # Class of every row, as run.predictIndividual gives it.
+    def predict(self, X):
+        return (self.evaluate(X) > self.threshold).astype(int)
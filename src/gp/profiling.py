@@ -0,0 +1,85 @@
+import signal
+from collections import Counter
+from contextlib import nullcontext
+from time import perf_counter
+
+PHASES = ('compile', 'eval', 'metrics', 'variation', 'selection')
+
+
+# Per-generation breakdown of where a GP run spends its time, plus the wall time of the whole
+# generation, the mean tree size and the hit rate of each cache over the generation. eaSimple
+# adds collect() to every logbook record.
+class GenerationProfile:
+    def __init__(self, caches=None):
+        self.caches = {name: cache for name, cache in (caches or {}).items() if cache is not None}
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.lookups = {name: (cache.hits, cache.misses) for name, cache in self.caches.items()}
+        self.generation_start = perf_counter()
+
+    @property
+    def fields(self):
+        return ['t_' + name for name in PHASES] + ['t_generation', 'mean_size'] + \
+            [name + '_hit_rate' for name in self.caches]
+
+    def phase(self, name):
+        return Phase(self.seconds, name)
+
+    # Fields of the generation that just ended; the counters start over for the next one.
+    def collect(self, population):
+        fields = {'t_' + name: seconds for name, seconds in self.seconds.items()}
+        fields['t_generation'] = perf_counter() - self.generation_start
+        self.generation_start = perf_counter()
+        fields['mean_size'] = sum(len(ind) for ind in population) / len(population) if population else 0.0
+        for name, cache in self.caches.items():
+            hits, misses = cache.hits - self.lookups[name][0], cache.misses - self.lookups[name][1]
+            fields[name + '_hit_rate'] = hits / (hits + misses) if hits + misses else 0.0
+            self.lookups[name] = (cache.hits, cache.misses)
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        return fields
+
+
+class Phase:
+    def __init__(self, seconds, name):
+        self.seconds = seconds
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.seconds[self.name] += perf_counter() - self.start
+
+
+# Times the enclosed block under name when a profile is given, else does nothing.
+def phase(profile, name):
+    return profile.phase(name) if profile is not None else nullcontext()
+
+
+# Statistical profiler for the main thread: every interval seconds of CPU time, a SIGPROF
+# handler counts the function running at that moment and its caller. Costs one Python call
+# per sample, so it can stay on for whole runs. Unix only; worker processes are not sampled.
+class SamplingProfiler:
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+
+    def sample(self, signum, frame):
+        if frame is not None:
+            caller = frame.f_back
+            self.samples[(frame.f_code.co_filename, frame.f_code.co_name, frame.f_lineno,
+                          caller.f_code.co_name if caller is not None else '')] += 1
+
+    def start(self):
+        self.previous = signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self.previous)
+
+    def report(self, n=30):
+        total = sum(self.samples.values())
+        lines = ['%d samples every %.3f s of CPU time' % (total, self.interval)]
+        for (filename, function, line, caller), count in self.samples.most_common(n):
+            lines.append('%6.2f%%  %s:%d %s (from %s)' % (100 * count / max(total, 1), filename, line, function, caller))
+        return '\n'.join(lines)
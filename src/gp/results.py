@@ -0,0 +1,66 @@
+import csv
+import json
+import os
+
+# Append-only store of finished experiments: a directory of JSON-lines tables, one row per line.
+# 'experiments' holds a row of metrics per experiment, 'generations' its per-generation logbook
+# records and 'pareto' its Pareto members as prefix expressions with their objective values.
+TABLES = ('experiments', 'generations', 'pareto')
+
+
+def tablePath(directory, table):
+    return os.path.join(directory, table + '.jsonl')
+
+
+def jsonValue(value):
+    # NumPy scalars and arrays
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+
+def clear(directory):
+    for table in TABLES:
+        if os.path.exists(tablePath(directory, table)):
+            os.remove(tablePath(directory, table))
+
+
+# Appends rows to a table in one write, flushed to disk before returning, so readers of a
+# running report see whole experiments.
+def append(directory, table, rows):
+    lines = ''.join(json.dumps(row, default=jsonValue) + '\n' for row in rows)
+    os.makedirs(directory, exist_ok=True)
+    with open(tablePath(directory, table), 'a') as f:
+        f.write(lines)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# Rows of a table one at a time, so a table never needs to fit in memory. A last line still
+# being written by another process is left out.
+def read(directory, table):
+    if not os.path.exists(tablePath(directory, table)):
+        return
+    with open(tablePath(directory, table)) as f:
+        for line in f:
+            if not line.endswith('\n'):
+                return
+            yield json.loads(line)
+
+
+def paretoRows(front, **fields):
+    return [dict(fields, expression=str(individual), values=list(values))
+            for individual, values in zip(front, front.values.tolist())]
+
+
+# Writes a table as CSV, columns in order of first appearance. The table is read twice, once
+# for the columns, instead of being loaded.
+def writeCSV(directory, table, path):
+    columns = {}
+    for row in read(directory, table):
+        columns.update(dict.fromkeys(row))
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, list(columns), restval='')
+        writer.writeheader()
+        writer.writerows(read(directory, table))
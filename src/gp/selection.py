@@ -0,0 +1,145 @@
+import numpy as np
+
+# Bytes of the boolean dominance blocks compared at once, so memory grows with the population
+# size rather than with its square.
+DOMINANCE_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def blockRows(n_columns):
+    return max(1, DOMINANCE_BLOCK_BYTES // (4 * max(n_columns, 1)))
+
+
+# Whether each row of W_rows is better (greater) and worse (less) than each row of W_columns
+# in some weighted objective. Comparisons with NaN are false, as in deap's Fitness.dominates.
+def compareBlock(W_rows, W_columns):
+    better = np.zeros((len(W_rows), len(W_columns)), dtype=bool)
+    worse = np.zeros((len(W_rows), len(W_columns)), dtype=bool)
+    for objective in range(W_rows.shape[1]):
+        better |= W_rows[:, objective, None] > W_columns[None, :, objective]
+        worse |= W_rows[:, objective, None] < W_columns[None, :, objective]
+    return better, worse
+
+
+# Number of rows of W dominating each row. Every pair is compared once: a block of rows
+# against itself and the rows after it gives both directions of the dominance relation.
+def dominationCounts(W):
+    counts = np.zeros(len(W), dtype=np.int64)
+    step = blockRows(len(W))
+    for start in range(0, len(W), step):
+        stop = min(start + step, len(W))
+        better, worse = compareBlock(W[start:stop], W[start:])
+        counts[start:] += (better & ~worse).sum(axis=0)
+        counts[start:stop] += (worse[:, stop - start:] & ~better[:, stop - start:]).sum(axis=1)
+    return counts
+
+
+# Fronts of distinct weighted fitnesses, ordered as deap.tools.sortNondominated orders them:
+# the first front by first appearance, every later one by the position in the previous front
+# of the last member dominating it, then by first appearance. Peeling stops once n_sorted
+# individuals (sizes counts the individuals of each fitness) are in a front.
+def sortFronts(W, sizes, n_sorted):
+    counts = dominationCounts(W)
+    front = np.flatnonzero(counts == 0)
+    fronts = [front]
+    sorted_count = sizes[front].sum()
+    pending = np.ones(len(W), dtype=bool)
+    pending[front] = False
+
+    while sorted_count < n_sorted:
+        columns = np.flatnonzero(pending)
+        decrement = np.zeros(len(columns), dtype=np.int64)
+        last_dominator = np.full(len(columns), -1)
+        step = blockRows(len(columns))
+        for start in range(0, len(front), step):
+            better, worse = compareBlock(W[front[start:start + step]], W[columns])
+            dominates = better & ~worse
+            decrement += dominates.sum(axis=0)
+            last = len(dominates) - 1 - np.argmax(dominates[::-1], axis=0)
+            last_dominator = np.where(dominates.any(axis=0), start + last, last_dominator)
+
+        counts[columns] -= decrement
+        released = (counts[columns] == 0) & (decrement > 0)
+        if not released.any():
+            break
+        front = columns[released][np.lexsort((columns[released], last_dominator[released]))]
+        fronts.append(front)
+        sorted_count += sizes[front].sum()
+        pending[front] = False
+
+    return fronts
+
+
+# Crowding distance of every individual as deap.tools.assignCrowdingDist computes it, for all
+# fronts at once. V holds the fitness values in front order and front_ids is nondecreasing.
+# The stable sort deap repeats per objective breaks ties by the previous objectives and then
+# by position, which the lexsort keys reproduce.
+def crowdingDistances(V, front_ids):
+    n, n_objectives = V.shape
+    distances = np.zeros(n)
+    keys = [np.arange(n)]
+    for objective in range(n_objectives):
+        keys.append(V[:, objective])
+        order = np.lexsort(keys + [front_ids])
+        fronts = front_ids[order]
+        first = np.ones(n, dtype=bool)
+        first[1:] = fronts[1:] != fronts[:-1]
+        last = np.ones(n, dtype=bool)
+        last[:-1] = fronts[:-1] != fronts[1:]
+
+        values = V[order, objective]
+        group = np.cumsum(first) - 1
+        low = values[np.flatnonzero(first)][group]
+        high = values[np.flatnonzero(last)][group]
+        middle = ~first & ~last & (high != low)
+        norm = n_objectives * (high - low)
+        inner = np.flatnonzero(middle)
+        distances[order[inner]] += (values[inner + 1] - values[inner - 1]) / norm[inner]
+        distances[order[first | last]] = np.inf
+    return distances
+
+
+# Drop-in replacement of deap.tools.selNSGA2 with the standard non-dominated sort: the same
+# individuals in the same order and the same crowding_dist on their fitnesses, with the
+# dominance checks and crowding distances computed in NumPy blocks instead of pair by pair.
+def selNSGA2(individuals, k):
+    if k == 0 or len(individuals) == 0:
+        return []
+
+    W_all = np.array([ind.fitness.wvalues for ind in individuals], dtype=float)
+    _, first_index, inverse = np.unique(W_all, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    # Distinct fitnesses numbered by first appearance, as deap's fitness-to-individuals dict.
+    appearance = np.argsort(first_index, kind='stable')
+    fitness_ids = np.empty(len(appearance), dtype=np.int64)
+    fitness_ids[appearance] = np.arange(len(appearance))
+    fitness_of = fitness_ids[inverse]
+    W = W_all[first_index[appearance]]
+    sizes = np.bincount(fitness_of, minlength=len(W))
+
+    fronts = sortFronts(W, sizes, min(len(individuals), k))
+
+    # Individuals in front order, those sharing a fitness in their order of appearance.
+    rank = np.full(len(W), -1)
+    front_of = np.full(len(W), -1)
+    sequence = np.concatenate(fronts)
+    rank[sequence] = np.arange(len(sequence))
+    for front_id, front in enumerate(fronts):
+        front_of[front] = front_id
+    placed = np.flatnonzero(rank[fitness_of] >= 0)
+    placed = placed[np.lexsort((placed, rank[fitness_of[placed]]))]
+    front_ids = front_of[fitness_of[placed]]
+
+    V = np.array([individuals[i].fitness.values for i in placed], dtype=float)
+    distances = crowdingDistances(V, front_ids)
+    for i, distance in zip(placed.tolist(), distances.tolist()):
+        individuals[i].fitness.crowding_dist = distance
+
+    # Whole fronts but the last, then the last one by decreasing crowding distance.
+    in_last = front_ids == len(fronts) - 1
+    chosen = placed[~in_last].tolist()
+    remaining = k - len(chosen)
+    if remaining > 0:
+        last = placed[in_last]
+        order = np.argsort(-distances[in_last], kind='stable')
+        chosen.extend(last[order][:remaining].tolist())
+    return [individuals[i] for i in chosen]
@@ -0,0 +1,246 @@
+# Distributed evaluation: a Master that hands batches of work to evaluation workers over
+# authenticated multiprocessing.connection sockets, and the worker side, started on any host
+# from the repository root with
+#   GP_SERVICE_AUTHKEY=<hex key of the master> python -m src.gp.service <host> <port>
+import importlib
+import io
+import os
+import pickle
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import traceback
+from multiprocessing.connection import Client, Listener
+from time import perf_counter
+
+AUTHKEY_VARIABLE = 'GP_SERVICE_AUTHKEY'
+# Directory holding run.py and src/, where local workers are started so they can import both
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def mainModule():
+    main = sys.modules['__main__']
+    spec = getattr(main, '__spec__', None)
+    if spec is not None and spec.name:
+        return spec.name
+    return os.path.splitext(os.path.basename(getattr(main, '__file__', '')))[0] or '__main__'
+
+
+def resolve(module, name):
+    return getattr(importlib.import_module(module), name)
+
+
+# Functions of the master's __main__ (run.py started as a script) are sent as references to the
+# module of the same file, which the workers import by name.
+class TaskPickler(pickle.Pickler):
+    def reducer_override(self, obj):
+        if callable(obj) and getattr(obj, '__module__', None) == '__main__' and hasattr(obj, '__qualname__') \
+                and '.' not in obj.__qualname__ and not isinstance(obj, type):
+            return resolve, (mainModule(), obj.__qualname__)
+        return NotImplemented
+
+
+def dumps(obj):
+    buffer = io.BytesIO()
+    TaskPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(obj)
+    return buffer.getvalue()
+
+
+# Results of one mapChunks call, filled in by the worker threads as chunks come back.
+class Batch:
+    def __init__(self, n_chunks):
+        self.results = [None] * n_chunks
+        self.remaining = n_chunks
+        self.error = None
+        self.condition = threading.Condition()
+
+    def done(self, index, result):
+        with self.condition:
+            self.results[index] = result
+            self.remaining -= 1
+            self.condition.notify_all()
+
+    def fail(self, error):
+        with self.condition:
+            self.error = error
+            self.condition.notify_all()
+
+
+# Evaluation master with the map/mapChunks/close interface of parallel.WorkerPool. Workers
+# may join at any time; each runs initializer(*initargs) once on joining, e.g. to load the
+# data split, then evaluates chunks. Work is split into about chunks_per_worker chunks per
+# live worker, and the chunks of a worker that disconnects or dies are handed to the others.
+# local_workers workers are started here as subprocesses. mapChunks fails when no worker
+# has been connected for worker_timeout seconds.
+class Master:
+    def __init__(self, address, initializer, initargs=(), local_workers=0, chunks_per_worker=4,
+                 worker_timeout=60.0):
+        key = os.environ.get(AUTHKEY_VARIABLE)
+        self.authkey = bytes.fromhex(key) if key else os.urandom(16)
+        self.listener = Listener(tuple(address), authkey=self.authkey)
+        self.address = self.listener.address
+        self.init_message = dumps(('init', initializer, tuple(initargs)))
+        self.chunks_per_worker = chunks_per_worker
+        self.worker_timeout = worker_timeout
+        self.tasks = queue.Queue()
+        self.workers = []
+        self.lock = threading.Lock()
+        self.closed = False
+        self.last_connected = perf_counter()
+
+        threading.Thread(target=self.accept, daemon=True).start()
+        environment = dict(os.environ, **{AUTHKEY_VARIABLE: self.authkey.hex()})
+        self.processes = [subprocess.Popen([sys.executable, '-m', 'src.gp.service', self.address[0],
+                                            str(self.address[1])], env=environment, cwd=REPOSITORY_DIRECTORY)
+                          for _ in range(local_workers)]
+
+    def accept(self):
+        while not self.closed:
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError):
+                if self.closed:
+                    return
+                continue
+            threading.Thread(target=self.serve, args=(connection,), daemon=True).start()
+
+    def alive(self):
+        with self.lock:
+            return sum(worker['alive'] for worker in self.workers)
+
+    # Joins one worker, then sends it chunks until it is lost or the master closes.
+    def serve(self, connection):
+        worker = dict(name='', alive=False, items=0, chunks=0, seconds=0.0, lost=False)
+        task = None
+        try:
+            hello = connection.recv()
+            worker['name'] = hello['host'] + ':' + str(hello['pid'])
+            connection.send_bytes(self.init_message)
+            reply = connection.recv()
+            if reply[0] != 'ready':
+                raise RuntimeError('Worker ' + worker['name'] + ' failed to start:\n' + reply[1])
+            with self.lock:
+                worker['alive'] = True
+                self.workers.append(worker)
+
+            while True:
+                task = self.tasks.get()
+                if task is None:
+                    connection.send_bytes(dumps(('stop',)))
+                    break
+                batch, index, func, chunk, each = task
+                # The rest of a failed batch is dropped, not evaluated ahead of later requests
+                if batch.error is not None:
+                    task = None
+                    continue
+                start = perf_counter()
+                connection.send_bytes(dumps(('task', func, chunk, each)))
+                reply = connection.recv()
+                if reply[0] == 'error':
+                    batch.fail(RuntimeError('Evaluation failed on ' + worker['name'] + ':\n' + reply[1]))
+                else:
+                    batch.done(index, reply[1])
+                worker['seconds'] += perf_counter() - start
+                worker['items'] += len(chunk)
+                worker['chunks'] += 1
+                task = None
+        except (OSError, EOFError, RuntimeError) as error:
+            # The chunk in flight goes back to the queue for another worker
+            if task is not None:
+                self.tasks.put(task)
+            worker['lost'] = not self.closed
+            if not worker['alive'] and not self.closed:
+                print('Evaluation worker ' + (worker['name'] or 'connection') + ' rejected: ' + str(error))
+        finally:
+            with self.lock:
+                if worker['alive']:
+                    self.last_connected = perf_counter()
+                worker['alive'] = False
+            connection.close()
+
+    def run(self, func, items, each):
+        items = list(items)
+        if not items:
+            return []
+        n_chunks = max(1, self.alive()) * self.chunks_per_worker
+        size = -(-len(items) // n_chunks)
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+        batch = Batch(len(chunks))
+        for index, chunk in enumerate(chunks):
+            self.tasks.put((batch, index, func, chunk, each))
+
+        with batch.condition:
+            while batch.remaining and batch.error is None:
+                batch.condition.wait(1.0)
+                if self.alive():
+                    continue
+                with self.lock:
+                    idle = perf_counter() - self.last_connected
+                if idle > self.worker_timeout:
+                    # Marks the batch failed, so workers joining later drop its chunks
+                    batch.error = RuntimeError('No evaluation worker connected to ' + str(self.address) + ' for ' +
+                                               str(int(idle)) + ' s')
+        if batch.error is not None:
+            raise batch.error
+        return [result for chunk in batch.results for result in chunk]
+
+    def map(self, func, iterable):
+        return self.run(func, iterable, True)
+
+    # func takes a list of items and returns a list of results, as for WorkerPool.mapChunks.
+    def mapChunks(self, func, items):
+        return self.run(func, items, False)
+
+    # Items evaluated per second of round trip, with the chunk counts, for every worker that joined.
+    def stats(self):
+        with self.lock:
+            return [dict(worker=worker['name'], items=worker['items'], chunks=worker['chunks'],
+                         items_per_s=worker['items'] / worker['seconds'] if worker['seconds'] else 0.0,
+                         lost=worker['lost']) for worker in self.workers]
+
+    def report(self):
+        lines = ['%-28s %10s %8s %12s' % ('evaluation worker', 'items', 'chunks', 'items/s')]
+        for worker in self.stats():
+            lines.append('%-28s %10d %8d %12.1f%s' % (worker['worker'], worker['items'], worker['chunks'],
+                                                       worker['items_per_s'], '  lost' if worker['lost'] else ''))
+        return '\n'.join(lines)
+
+    def close(self):
+        self.closed = True
+        for _ in range(self.alive()):
+            self.tasks.put(None)
+        self.listener.close()
+        for process in self.processes:
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+# Worker side: joins the master at address, runs its initializer, then evaluates the chunks
+# it is sent until told to stop.
+def work(address, authkey):
+    with Client(address, authkey=authkey) as connection:
+        connection.send(dict(host=socket.gethostname(), pid=os.getpid()))
+        while True:
+            message = pickle.loads(connection.recv_bytes())
+            try:
+                if message[0] == 'stop':
+                    return
+                if message[0] == 'init':
+                    message[1](*message[2])
+                    connection.send(('ready',))
+                else:
+                    _, func, chunk, each = message
+                    connection.send(('result', [func(item) for item in chunk] if each else func(chunk)))
+            except Exception:
+                connection.send(('error', traceback.format_exc()))
+                if message[0] == 'init':
+                    return
+
+
+if __name__ == '__main__':
+    work((sys.argv[1], int(sys.argv[2])), bytes.fromhex(os.environ[AUTHKEY_VARIABLE]))
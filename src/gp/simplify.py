@@ -0,0 +1,88 @@
+import numpy as np
+
+from deap import gp
+
+from src.gp import evaluation
+
+COMMUTATIVE = {'add', 'mul'}
+
+
+# A rewritten subtree: its prefix nodes, its canonical string, its value when it is a constant
+# and whether it is a single feature column.
+class Subtree:
+    def __init__(self, nodes, key, value=None, feature=False):
+        self.nodes = nodes
+        self.key = key
+        self.value = value
+        self.feature = feature
+
+
+def constant(value, pset):
+    # Adding 0.0 turns -0.0 into 0.0, so both zeros have one canonical form
+    value = float(value) + 0.0
+    node = gp.Terminal(value, False, pset.ret)
+    return Subtree([node], node.name, value)
+
+
+def leaf(node, pset):
+    if isinstance(node.value, str) and node.value in pset.arguments:
+        return Subtree([node], node.name, feature=True)
+    value = pset.context[node.value] if isinstance(node.value, str) and node.value in pset.context else node.value
+    if isinstance(value, (int, float)) and np.isfinite(value):
+        return Subtree([node], node.name, float(value))
+    return Subtree([node], node.name)
+
+
+def isConstant(subtree, value):
+    return subtree.value is not None and subtree.value == value
+
+
+# Rewrites of one primitive over already simplified operands. Only rewrites that leave every
+# prediction unchanged under IEEE arithmetic and the protected division are applied: feature
+# columns are finite (the data are scaled), but any other subtree may be inf or NaN and only
+# the sign of a zero is ever lost, which neither a comparison nor protectedDiv can observe.
+# protectedDiv(a, a) is not 1 (it is 0 where a is 0) and sums are not reassociated.
+def rewrite(node, operands, pset):
+    name = node.name
+    if name in evaluation.VECTORIZED_PRIMITIVES and all(operand.value is not None for operand in operands):
+        with np.errstate(all='ignore'):
+            value = evaluation.VECTORIZED_PRIMITIVES[name](*[np.float64(operand.value) for operand in operands])
+        if np.isfinite(value):
+            return constant(value, pset)
+
+    if name in ('add', 'sub', 'mul', 'protectedDiv') and len(operands) == 2:
+        left, right = operands
+        if name == 'add' and isConstant(left, 0):
+            return right
+        if name in ('add', 'sub') and isConstant(right, 0):
+            return left
+        if name == 'mul' and isConstant(left, 1):
+            return right
+        if name == 'mul' and isConstant(right, 1):
+            return left
+        if name == 'mul' and (isConstant(left, 0) and right.feature or isConstant(right, 0) and left.feature):
+            return constant(0.0, pset)
+        if name == 'sub' and left.feature and left.key == right.key:
+            return constant(0.0, pset)
+        # x / 1 and x / 0 (the protected denominator becomes 1) are both x
+        if name == 'protectedDiv' and (isConstant(right, 1) or isConstant(right, 0)):
+            return left
+
+    # a + b and a * b are exact in either order, so their operands are sorted by key
+    if name in COMMUTATIVE:
+        operands = sorted(operands, key=lambda operand: operand.key)
+    return Subtree([node] + [n for operand in operands for n in operand.nodes],
+                   name + '(' + ', '.join(operand.key for operand in operands) + ')')
+
+
+# Canonical reduced form of a prefix expression, as a new gp.PrimitiveTree: constant subtrees
+# folded, neutral operands dropped and commutative operands ordered. It predicts exactly what
+# expr predicts, and equal canonical strings identify trees that are equal up to these rewrites.
+def simplify(expr, pset):
+    stack = []
+    for node in reversed(expr):
+        if isinstance(node, gp.Primitive):
+            stack.append(rewrite(node, [stack.pop() for _ in range(node.arity)], pset))
+        else:
+            stack.append(leaf(node, pset))
+    return gp.PrimitiveTree(stack[0].nodes)
@@ -0,0 +1,84 @@
+from time import perf_counter
+
+import numpy as np
+
+# Reference point of the hypervolume in minimization form (-F1, ARI, complex terminals): every
+# objective of run.calculateObjectives lies in [0, 1].
+HYPERVOLUME_REFERENCE = (0.0, 1.0, 1.0)
+
+
+# Area dominated by 2-D minimization points up to the reference, by a sweep along x.
+def area(points, reference):
+    total = 0.0
+    best_y = reference[1]
+    for x, y in points[np.argsort(points[:, 0], kind='stable')].tolist():
+        if y < best_y:
+            total += (reference[0] - x) * (best_y - y)
+            best_y = y
+    return total
+
+
+# Exact hypervolume dominated by 3-D minimization points up to the reference: the dominated
+# area of the points at or below each distinct z, times the height of that slab. Points not
+# strictly better than the reference in every objective add nothing.
+def hypervolume(points, reference=HYPERVOLUME_REFERENCE):
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    points = points[np.all(points < np.asarray(reference), axis=1)]
+    if len(points) == 0:
+        return 0.0
+
+    levels = np.unique(points[:, 2])
+    tops = np.append(levels[1:], reference[2])
+    return float(sum(area(points[points[:, 2] <= z, :2], reference) * (top - z) for z, top in zip(levels, tops)))
+
+
+# Stopping rule for evolution.eaSimple. Ends the run before a generation that would take it past
+# the wall-clock (seconds) or evaluation budget, projecting from the generation just completed,
+# or once the convergence indicator ('hypervolume' or 'best_fscore', of the archive when one is
+# given, else of the population) has improved by at most tolerance, relative, over the last
+# patience generations. Each generation's indicator is added to its logbook record, and reason
+# tells what ended the run.
+class Budget:
+    def __init__(self, archive=None, seconds=None, evaluations=None, patience=None, tolerance=1e-4,
+                 indicator='hypervolume'):
+        if indicator not in ('hypervolume', 'best_fscore'):
+            raise ValueError('Unknown convergence indicator ' + indicator + ', expected hypervolume or best_fscore')
+        self.archive = archive
+        self.seconds = seconds
+        self.evaluations = evaluations
+        self.patience = patience
+        self.tolerance = tolerance
+        self.indicator = indicator
+        self.history = []
+        self.reason = None
+        self.start = perf_counter()
+        self.last_elapsed = 0.0
+
+    def measure(self, population):
+        members = self.archive if self.archive is not None and len(self.archive) else population
+        if self.indicator == 'best_fscore':
+            return max(ind.fitness.values[0] for ind in members)
+        return hypervolume([[-w for w in ind.fitness.wvalues] for ind in members])
+
+    def stagnated(self):
+        if self.patience is None or len(self.history) <= self.patience:
+            return False
+        before = self.history[-1 - self.patience]
+        return self.history[-1] - before <= self.tolerance * max(abs(before), np.finfo(float).tiny)
+
+    def __call__(self, gen, population, logbook):
+        self.history.append(self.measure(population))
+        logbook[-1][self.indicator] = self.history[-1]
+
+        elapsed = perf_counter() - self.start
+        generation_seconds = elapsed - self.last_elapsed
+        self.last_elapsed = elapsed
+        evaluations = sum(logbook.select('nevals'))
+
+        if self.seconds is not None and elapsed + generation_seconds > self.seconds:
+            self.reason = 'seconds'
+        elif self.evaluations is not None and evaluations + logbook[-1]['nevals'] > self.evaluations:
+            self.reason = 'evaluations'
+        elif self.stagnated():
+            self.reason = 'stagnation'
+        return self.reason is not None
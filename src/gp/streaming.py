@@ -0,0 +1,46 @@
+import resource
+import sys
+from time import perf_counter
+
+import numpy as np
+
+from src.gp import evaluation
+from src.gp import metrics
+from src.gp import profiling
+
+
+# Individual-rows streamed through evaluation and the time it took, for the run log.
+class StreamStats:
+    def __init__(self):
+        self.rows = 0
+        self.seconds = 0.0
+
+    def throughput(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+# Confusion counts (tp, fp, fn, tn) of every individual over X, read chunk_rows rows at a time.
+# Only one chunk of X, its labels and the batch's predictions for it are in memory at once,
+# so with X memory-mapped the footprint does not grow with the number of rows.
+def confusionCounts(individuals, X, labels, pset, chunk_rows, stats=None, profile=None):
+    counts = np.zeros((4, len(individuals)), dtype=np.int64)
+    time_start = perf_counter()
+
+    for start in range(0, len(X), chunk_rows):
+        X_chunk = np.asarray(X[start:start + chunk_rows], dtype=float)
+        reference = metrics.PackedLabels(np.asarray(labels[start:start + chunk_rows]))
+        y_preds = evaluation.predictPopulation(individuals, X_chunk, pset, profile=profile)
+        with profiling.phase(profile, 'metrics'):
+            counts += np.array(metrics.confusion(y_preds, reference))
+
+    if stats is not None:
+        stats.rows += len(X) * len(individuals)
+        stats.seconds += perf_counter() - time_start
+    return counts
+
+
+# Peak resident set size of this process in megabytes.
+def peakRSS():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
@@ -0,0 +1,157 @@
+import copy
+
+import numpy as np
+
+from deap import creator
+from deap import gp
+
+
+# Number of nodes of each kind of a code array, and their summed complexity factors.
+def structureOf(cls, codes):
+    return int(cls.primitive_table[codes].sum()), int(len(codes) - cls.primitive_table[codes].sum()), \
+        int(cls.complexity_table[codes].sum())
+
+
+# Unpickles an individual with the creator class of that name as bound in this process.
+def rebuild(class_name, expression, values):
+    cls = getattr(creator, class_name)
+    individual = cls.from_string(expression, cls.pset)
+    if values:
+        individual.fitness.values = values
+    return individual
+
+
+# PrimitiveTree mirrored by a compact prefix encoding: one small integer code per node, indexing
+# the node tables of the class. The node list stays, since deap's operators slice and assign it,
+# but every change also updates the code array and the primitive/terminal counts and complexity
+# sum incrementally. Height is cached until the next change, and cloning copies the node list
+# and code array as they are instead of re-running __init__ and deep-copying the attributes.
+class CompactTree(gp.PrimitiveTree):
+    codes_by_name = {}
+    arity_table = np.zeros(0, dtype=np.int8)
+    primitive_table = np.zeros(0, dtype=bool)
+    complexity_table = np.zeros(0, dtype=np.int64)
+    code_dtype = np.int8
+    pset = None
+
+    # Builds the node tables for the primitives and terminals of pset.
+    @classmethod
+    def bind(cls, pset, complexity_factor):
+        cls.pset = pset
+        nodes = [node for nodes in pset.primitives.values() for node in nodes] + \
+                [node for nodes in pset.terminals.values() for node in nodes]
+        cls.codes_by_name = {}
+        cls.arity_table = np.zeros(0, dtype=np.int8)
+        cls.primitive_table = np.zeros(0, dtype=bool)
+        cls.complexity_table = np.zeros(0, dtype=np.int64)
+        cls.code_dtype = np.int8 if len(nodes) < 100 else np.int16
+        for node in nodes:
+            cls.register(node, complexity_factor(node.name) if isinstance(node, gp.Primitive) else 0)
+
+    @classmethod
+    def register(cls, node, complexity=0):
+        cls.codes_by_name[node.name] = len(cls.codes_by_name)
+        cls.arity_table = np.append(cls.arity_table, node.arity).astype(np.int8)
+        cls.primitive_table = np.append(cls.primitive_table, isinstance(node, gp.Primitive))
+        cls.complexity_table = np.append(cls.complexity_table, complexity or 0)
+        if len(cls.codes_by_name) >= np.iinfo(cls.code_dtype).max:
+            cls.code_dtype = np.int16
+        return cls.codes_by_name[node.name]
+
+    @classmethod
+    def encode(cls, nodes):
+        codes_by_name = cls.codes_by_name
+        # Nodes outside the bound pset (e.g. constants) get a code on first sight.
+        return np.array([codes_by_name[node.name] if node.name in codes_by_name else cls.register(node)
+                         for node in nodes], dtype=cls.code_dtype)
+
+    def __init__(self, content):
+        gp.PrimitiveTree.__init__(self, content)
+        self.reindex()
+
+    def reindex(self):
+        self.codes = self.encode(self)
+        self.primitiveCount, self.terminalCount, self.complexity = structureOf(type(self), self.codes)
+        self.cached_height = None
+
+    def __setitem__(self, key, val):
+        gp.PrimitiveTree.__setitem__(self, key, val)
+        if not isinstance(key, slice):
+            # Negative indices count from the end, as for the list
+            key = range(len(self.codes))[key]
+            key = slice(key, key + 1)
+            val = [val]
+        start, stop, _ = key.indices(len(self.codes))
+        new_codes = self.encode(val)
+        old = structureOf(type(self), self.codes[start:stop])
+        new = structureOf(type(self), new_codes)
+        self.primitiveCount += new[0] - old[0]
+        self.terminalCount += new[1] - old[1]
+        self.complexity += new[2] - old[2]
+        self.codes = np.concatenate((self.codes[:start], new_codes, self.codes[stop:]))
+        self.cached_height = None
+
+    def __deepcopy__(self, memo):
+        new = self.__class__.__new__(self.__class__)
+        list.extend(new, self)
+        new.__dict__.update(self.__dict__)
+        new.codes = self.codes.copy()
+        new.fitness = copy.deepcopy(self.fitness, memo)
+        return new
+
+    # Bound individuals pickle as their expression and fitness values: deap pickles creator
+    # classes by value, so the default pickle would come back as a new, unbound class whose
+    # codes no longer match the node tables (e.g. in checkpoints or from worker processes).
+    def __reduce__(self):
+        if type(self).pset is None or not hasattr(creator, type(self).__name__):
+            return gp.PrimitiveTree.__reduce__(self)
+        fitness = getattr(self, 'fitness', None)
+        values = fitness.values if fitness is not None and fitness.valid else ()
+        return rebuild, (type(self).__name__, str(self), values)
+
+    @property
+    def height(self):
+        if self.cached_height is None:
+            stack = [0]
+            max_depth = 0
+            for arity in self.arity_table[self.codes].tolist():
+                depth = stack.pop()
+                max_depth = max(max_depth, depth)
+                stack.extend([depth + 1] * arity)
+            self.cached_height = max_depth
+        return self.cached_height
+
+    # Any other in-place list change rebuilds the encoding from the nodes.
+    def __delitem__(self, key):
+        list.__delitem__(self, key)
+        self.reindex()
+
+    def __iadd__(self, other):
+        list.__iadd__(self, other)
+        self.reindex()
+        return self
+
+    def append(self, node):
+        list.append(self, node)
+        self.reindex()
+
+    def extend(self, nodes):
+        list.extend(self, nodes)
+        self.reindex()
+
+    def insert(self, index, node):
+        list.insert(self, index, node)
+        self.reindex()
+
+    def pop(self, index=-1):
+        node = list.pop(self, index)
+        self.reindex()
+        return node
+
+    def remove(self, node):
+        list.remove(self, node)
+        self.reindex()
+
+    def clear(self):
+        list.clear(self)
+        self.reindex()
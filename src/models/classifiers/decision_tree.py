@@ -1,8 +1,10 @@
 from sklearn import tree
 
+HYPERPARAMETERS = dict(random_state=None)
+
 
 def createInstance(X_train, X_test, y_train):
-    classifier = tree.DecisionTreeClassifier(random_state=None)
+    classifier = tree.DecisionTreeClassifier(**HYPERPARAMETERS)
     classifier.fit(X_train, y_train)
 
     return classifier.predict(X_test), classifier.predict(X_train), classifier
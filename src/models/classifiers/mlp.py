@@ -1,33 +1,67 @@
+import os
 import statistics
 
+import numpy as np
 import sklearn.metrics
 from sklearn.neural_network import MLPClassifier
-from time import process_time
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
 
+X_train = None
+X_test = None
+y_train = None
+y_test = None
 
-def createInstance(X_train, X_test, y_train, y_test):
+HYPERPARAMETERS = dict(solver='lbfgs', alpha=1e-5, hidden_layer_sizes=(3, 3), random_state=None, max_iter=1000)
 
-    mlp_time_avg = 0
-    fscore_avg = []
-    accuracy_avg = []
-    for i in range(0,29):
-        mlp_time_start = process_time()
-        classifier = MLPClassifier(solver='lbfgs', alpha=1e-5, hidden_layer_sizes=(3, 3), random_state=None, max_iter=1000).fit(
-            X_train, y_train)
 
-        predict_X_test = classifier.predict(X_test)
-        predict_X_train = classifier.predict(X_train)
-        fscore_avg.append(sklearn.metrics.f1_score(y_test, predict_X_test))
-        accuracy_avg.append(sklearn.metrics.accuracy_score(y_test, predict_X_test))
+def initWorker(X_train_, X_test_, y_train_, y_test_):
+    # The data split is sent once per worker instead of once per fit.
+    global X_train, X_test, y_train, y_test
+    X_train, X_test, y_train, y_test = X_train_, X_test_, y_train_, y_test_
 
-        mlp_time_end = process_time()
-        mlp_time_avg += mlp_time_end-mlp_time_start
+
+def fitInstance(random_state):
+    # Wall-clock time of one fit, measured inside the worker that ran it, and that worker's pid.
+    mlp_time_start = perf_counter()
+    classifier = MLPClassifier(**dict(HYPERPARAMETERS, random_state=random_state)).fit(X_train, y_train)
+
+    predict_X_test = classifier.predict(X_test)
+    predict_X_train = classifier.predict(X_train)
+    fscore = sklearn.metrics.f1_score(y_test, predict_X_test)
+    accuracy = sklearn.metrics.accuracy_score(y_test, predict_X_test)
+
+    mlp_time_end = perf_counter()
+    return predict_X_test, predict_X_train, classifier, fscore, accuracy, mlp_time_end - mlp_time_start, os.getpid()
+
+
+def createInstance(X_train, X_test, y_train, y_test, n_workers=None):
+    # Repetitions run concurrently on n_workers processes (None: one per CPU, 1: in this process).
+    # Each fit gets its own seed, as forked workers would otherwise share numpy's global RNG
+    # state and repeat each other's initial weights.
+    random_states = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence().spawn(29)]
+    if n_workers == 1:
+        initWorker(X_train, X_test, y_train, y_test)
+        results = [fitInstance(random_state) for random_state in random_states]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=initWorker,
+                                 initargs=(X_train, X_test, y_train, y_test)) as executor:
+            results = list(executor.map(fitInstance, random_states))
+
+    mlp_time_avg = sum(result[5] for result in results)
+    fscore_avg = [result[3] for result in results]
+    accuracy_avg = [result[4] for result in results]
+    predict_X_test, predict_X_train, classifier, _, _, mlp_time, _ = results[-1]
+    worker_time = {}
+    for result in results:
+        worker_time[result[6]] = worker_time.get(result[6], 0.0) + result[5]
 
     print('MLP f_score: ', sum(fscore_avg)/30)
     print('MLP accuracy: ', sum(accuracy_avg)/30)
     print('MLP std f_score: ', statistics.pstdev(fscore_avg))
     print('MLP std accuracy: ', statistics.pstdev(accuracy_avg))
     print('MLP time processing: ', mlp_time_avg/30)
+    for worker, seconds in worker_time.items():
+        print('MLP worker %d: %d fits, %.2f s' % (worker, sum(result[6] == worker for result in results), seconds))
 
-    return predict_X_test, predict_X_train, classifier, mlp_time_end-mlp_time_start
-
+    return predict_X_test, predict_X_train, classifier, mlp_time
@@ -3,8 +3,25 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 import numpy as np
 import pandas as pd
+import os
 
-def fetch_iris():
+DATASET_DIRECTORY = './.cache/datasets'
+
+
+def split_and_scale(X, y, random_state=None):
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=random_state)
+
+    scaler_X = StandardScaler()
+
+    # Column-major input, as from the DataFrames the datasets were scaled from, so the scaler's
+    # column sums and therefore the scaled values come out bit for bit the same.
+    X_train_scaled = scaler_X.fit_transform(np.asfortranarray(X_train))
+    X_test_scaled = scaler_X.transform(np.asfortranarray(X_test))
+
+    return X_train_scaled, X_test_scaled, y_train, y_test
+
+
+def read_iris():
     print('Opening iris dataset...')
     iris_dataset = load_iris()
 
@@ -17,95 +34,56 @@ def fetch_iris():
 
     y = [int(y[i] > 1) for i in range(len(y)) if y[i] > 0]
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2)
-
-    scaler_X = StandardScaler()
-
-    X_train_scaled = scaler_X.fit_transform(X_train)
-    X_test_scaled = scaler_X.transform(X_test)
-    print(X_train)
-    return X_train_scaled, X_test_scaled, y_train, y_test
+    return X.to_numpy(dtype=float), np.array(y)
 
 
-def fetch_breast_cancer():
+def read_breast_cancer():
     print('Opening breast cancer dataset...')
 
     breast_dataset = load_breast_cancer()
 
-    X = pd.DataFrame(breast_dataset.data, columns=breast_dataset.feature_names)
-
-    y = breast_dataset.target
-
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2)
-
-    scaler_X = StandardScaler()
-
-    X_train_scaled = scaler_X.fit_transform(X_train)
-    X_test_scaled = scaler_X.transform(X_test)
-
-    return X_train_scaled, X_test_scaled, y_train, y_test
+    return breast_dataset.data.astype(float), breast_dataset.target
 
 
-def fetch_digits(targetNumber1, targetNumber2):
+def read_digits(targetNumber1, targetNumber2):
 
     digits_dataset = load_digits()
 
     index = (digits_dataset.target == targetNumber1) | (digits_dataset.target == targetNumber2)
 
     y = digits_dataset.target[index]
-    X = pd.DataFrame(digits_dataset.data[index], columns=digits_dataset.feature_names)
+    X = digits_dataset.data[index]
 
     y = np.where(y == targetNumber1, 0, y)
     y = np.where(y == targetNumber2, 1, y)
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2)
-
-    scaler_X = StandardScaler()
+    return X.astype(float), y
 
-    X_train_scaled = scaler_X.fit_transform(X_train)
-    X_test_scaled = scaler_X.transform(X_test)
 
-    return X_train_scaled, X_test_scaled, y_train, y_test
-
-
-def fetch_view_recommendations():
+def read_view_recommendations():
     view_data = pd.read_csv('./src/utils/views_classification.csv')
     X = view_data[
         ['Col_Dimension', 'Col_Measure', 'Col_Function', 'Rows', 'Min', 'Max', 'Distinct', 'Null', 'Deviation']]
-    print(X.columns)
     y = view_data[['Class']]
-    print(y.columns)
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2)
 
-    scaler_X = StandardScaler()
+    return X.to_numpy(dtype=float), y.to_numpy().ravel()
 
-    X_train_scaled = scaler_X.fit_transform(X_train)
-    X_test_scaled = scaler_X.transform(X_test)
-
-    return X_train_scaled, X_test_scaled, y_train, y_test
 
-
-def fetch_kdd():
-    # @TODO: Investigar tipos de dados vindo desta base.
-    kdd_dataset = fetch_kddcup99();
+def read_kdd():
+    # Symbolic columns (protocol, service, flag) become category codes and the target is
+    # binary: normal traffic against any attack.
+    kdd_dataset = fetch_kddcup99()
 
     X = pd.DataFrame(kdd_dataset.data, columns=kdd_dataset.feature_names)
+    for column in ['protocol_type', 'service', 'flag']:
+        X[column] = X[column].astype('category').cat.codes
 
-    print(X.info())
-
-    y = kdd_dataset.target
-
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2)
-
-    scaler_X = StandardScaler()
-
-    X_train_scaled = scaler_X.fit_transform(X_train)
-    X_test_scaled = scaler_X.transform(X_test)
+    y = (kdd_dataset.target != b'normal.').astype('int')
 
-    return X_train_scaled, X_test_scaled, y_train, y_test
+    return X.to_numpy(dtype=float), y
 
 
-def fetch_ionosphere():
+def read_ionosphere():
     load_ionosphere = pd.read_csv('./src/utils/ionosphere.data')
     X = load_ionosphere.iloc[:,0:34]
     y = load_ionosphere.iloc[:,34]
@@ -113,35 +91,21 @@ def fetch_ionosphere():
     y = np.where(y == 'g', 1, y)
     y = y.astype('int')
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2)
-
-    scaler_X = StandardScaler()
+    return X.to_numpy(dtype=float), y
 
-    X_train_scaled = scaler_X.fit_transform(X_train)
-    X_test_scaled = scaler_X.transform(X_test)
-
-    return X_train_scaled, X_test_scaled, y_train, y_test
 
-
-def fetch_wine():
+def read_wine():
     load_wine = pd.read_csv('https://archive.ics.uci.edu/ml/machine-learning-databases/wine-quality/winequality-red.csv', sep=';')
     X = load_wine.iloc[:, 0:12]
     y = load_wine['quality']
     y = np.where(y <= 5, 0, y)
     y = np.where(y > 5, 1, y)
     y = y.astype('int')
-    print(y)
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2)
-
-    scaler_X = StandardScaler()
 
-    X_train_scaled = scaler_X.fit_transform(X_train)
-    X_test_scaled = scaler_X.transform(X_test)
+    return X.to_numpy(dtype=float), y
 
-    return X_train_scaled, X_test_scaled, y_train, y_test
 
-
-def fetch_banknotes():
+def read_banknotes():
     load_banknotes = pd.read_csv('./src/utils/data_banknote_authentication.txt', sep=',')
     X = load_banknotes.iloc[:,0:4]
     y = load_banknotes.iloc[:,4]
@@ -149,14 +113,82 @@ def fetch_banknotes():
     y = y.astype('int')
     X = X.astype('double')
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2)
+    return X.to_numpy(), y.to_numpy()
 
-    scaler_X = StandardScaler()
 
-    X_train_scaled = scaler_X.fit_transform(X_train)
-    X_test_scaled = scaler_X.transform(X_test)
+def fetch_iris(random_state=None):
+    return split_and_scale(*read_iris(), random_state=random_state)
 
-    return X_train_scaled, X_test_scaled, y_train, y_test
+
+def fetch_breast_cancer(random_state=None):
+    return split_and_scale(*read_breast_cancer(), random_state=random_state)
+
+
+def fetch_digits(targetNumber1, targetNumber2, random_state=None):
+    return split_and_scale(*read_digits(targetNumber1, targetNumber2), random_state=random_state)
+
+
+def fetch_view_recommendations(random_state=None):
+    return split_and_scale(*read_view_recommendations(), random_state=random_state)
+
+
+def fetch_kdd(random_state=None):
+    return split_and_scale(*read_kdd(), random_state=random_state)
+
+
+def fetch_ionosphere(random_state=None):
+    return split_and_scale(*read_ionosphere(), random_state=random_state)
+
+
+def fetch_wine(random_state=None):
+    return split_and_scale(*read_wine(), random_state=random_state)
+
+
+def fetch_banknotes(random_state=None):
+    return split_and_scale(*read_banknotes(), random_state=random_state)
+
+
+# Parsed (unscaled) features and binary target of every dataset, by the name used in run.py.
+DATASETS = {
+    'iris': read_iris,
+    'breast_cancer': read_breast_cancer,
+    'digits1_7': lambda: read_digits(1, 7),
+    'digits3_9': lambda: read_digits(3, 9),
+    'view_recommendations': read_view_recommendations,
+    'kdd': read_kdd,
+    'ionosphere': read_ionosphere,
+    'wine': read_wine,
+    'banknotes': read_banknotes,
+}
+
+
+def cached_arrays(directory, names, build):
+    # Loads the named .npy files memory-mapped, building and saving them first if missing.
+    paths = [os.path.join(directory, name + '.npy') for name in names]
+    if not all(os.path.exists(path) for path in paths):
+        os.makedirs(directory, exist_ok=True)
+        for path, array in zip(paths, build()):
+            np.save(path + '.tmp.npy', np.asarray(array))
+            os.replace(path + '.tmp.npy', path)
+
+    return [np.load(path, mmap_mode='r') for path in paths]
+
+
+# Returns X_train, X_test, y_train, y_test of a registered dataset. The parsed dataset is
+# stored once, so later runs need neither the network nor the text parsers. A seeded split
+# is stored too and comes back as read-only memory maps; an unseeded one is drawn anew.
+def load_dataset(name, random_state=None, directory=DATASET_DIRECTORY):
+    if name not in DATASETS:
+        raise ValueError('Unknown dataset ' + name + ', expected one of ' + ', '.join(DATASETS))
+
+    dataset_directory = os.path.join(directory, name)
+    X, y = cached_arrays(dataset_directory, ['X', 'y'], DATASETS[name])
+    if random_state is None:
+        return split_and_scale(X, y)
+
+    return cached_arrays(os.path.join(dataset_directory, 'split_' + str(random_state)),
+                         ['X_train', 'X_test', 'y_train', 'y_test'],
+                         lambda: split_and_scale(X, y, random_state=random_state))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,43 @@
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+
+STORE_DIRECTORY = './.cache/opaque_models'
+
+
+# Identifies a trained opaque model by everything its predictions depend on.
+def storeKey(dataset, split_seed, model_type, hyperparameters):
+    description = json.dumps(dict(dataset=dataset, split_seed=split_seed, model_type=model_type,
+                                  hyperparameters=hyperparameters), sort_keys=True, default=str)
+    return hashlib.sha1(description.encode()).hexdigest()
+
+
+def load(key, directory=STORE_DIRECTORY):
+    path = os.path.join(directory, key)
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+
+    with open(os.path.join(path, 'model.pkl'), 'rb') as f:
+        classifier = pickle.load(f)
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+
+    return np.load(os.path.join(path, 'prediction_test.npy')), np.load(os.path.join(path, 'prediction_train.npy')), \
+        classifier, meta
+
+
+# Writes the model and its predictions first and meta.json last, so a half-written entry is never loaded.
+def save(key, prediction_test, prediction_train, classifier, meta, directory=STORE_DIRECTORY):
+    path = os.path.join(directory, key)
+    os.makedirs(path, exist_ok=True)
+
+    np.save(os.path.join(path, 'prediction_test.npy'), np.asarray(prediction_test))
+    np.save(os.path.join(path, 'prediction_train.npy'), np.asarray(prediction_train))
+    with open(os.path.join(path, 'model.pkl'), 'wb') as f:
+        pickle.dump(classifier, f)
+    with open(os.path.join(path, 'meta.json.tmp'), 'w') as f:
+        json.dump(meta, f, default=str)
+    os.replace(os.path.join(path, 'meta.json.tmp'), os.path.join(path, 'meta.json'))
@@ -0,0 +1,172 @@
+# Sweep of datasets x GP settings x experiment seeds. Every job is one seeded GP run (see
+# run.runExperiment) whose result goes to sweep_results/<dataset>/<configuration>/seed_<seed>.json;
+# jobs that already have a result are skipped, so an interrupted sweep carries on where it stopped.
+# Opaque models are trained or loaded once per dataset before any job starts, and jobs are handed
+# one at a time to idle workers in dataset order, so each worker keeps the split and opaque
+# predictions it loaded for the jobs that follow.
+# Run from the repository root: python sweep.py [workers]
+import contextlib
+import csv
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import traceback
+from time import perf_counter
+
+import run
+from src.gp import evolution
+from src.gp import results
+from src.utils import fetch_dataset
+from src.utils import model_store
+
+DATASETS = ['ionosphere', 'breast_cancer', 'digits1_7', 'digits3_9', 'banknotes', 'wine']
+# Values of run.py globals to sweep, each combination being one configuration. Settings that start
+# processes of their own (n_islands, evaluation_workers, experiment_workers, service_address)
+# cannot be swept, as the jobs already run in pool workers.
+GRID = dict(population_size=[300], n_generations=[40], opaque_model=['mlp'])
+SEEDS = range(30)
+SPLIT_SEED = 0
+RESULT_DIRECTORY = 'sweep_results'
+
+# run.py values of the swept globals and of the opaque model, restored before every job
+DEFAULTS = {name: getattr(run, name) for name in sorted(set(GRID) | {'opaque_model'})}
+# (dataset, opaque model) whose data this worker holds
+loaded = None
+
+
+def configurations(grid):
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def configurationName(configuration):
+    return ','.join(name + '=' + str(configuration[name]) for name in sorted(configuration))
+
+
+def resultPath(dataset, configuration, seed):
+    return os.path.join(RESULT_DIRECTORY, dataset, configurationName(configuration), 'seed_' + str(seed) + '.json')
+
+
+# Jobs without a result, by dataset, then configuration, then seed.
+def pendingJobs(datasets, grid, seeds):
+    return [(dataset, configuration, seed) for dataset in datasets for configuration in configurations(grid)
+            for seed in seeds if not os.path.exists(resultPath(dataset, configuration, seed))]
+
+
+# Trains the opaque model of a dataset, or finds it in model_store, so that jobs only load it.
+def prepare(dataset, opaque_model):
+    run.split_seed = SPLIT_SEED
+    run.opaque_model = opaque_model
+    run.X_train, run.X_test, run.y_train, run.y_test = fetch_dataset.load_dataset(dataset, SPLIT_SEED)
+    run.trainOpaqueModel(dataset)
+
+
+def load(dataset, opaque_model):
+    global loaded
+    if loaded == (dataset, opaque_model):
+        return
+    module = run.mlp if opaque_model == 'mlp' else run.decision_tree
+    stored = model_store.load(model_store.storeKey(dataset, SPLIT_SEED, opaque_model, module.HYPERPARAMETERS))
+    if stored is None:
+        raise ValueError('No stored ' + opaque_model + ' for ' + dataset + ' with split seed ' + str(SPLIT_SEED))
+    run.X_train, run.X_test, run.y_train, run.y_test = fetch_dataset.load_dataset(dataset, SPLIT_SEED)
+    run.opaque_model_prediction_test, run.opaque_model_prediction_train = stored[0], stored[1]
+    # Cached scores hold for one split and one set of opaque labels
+    if run.fitness_cache is not None:
+        run.fitness_cache.clear()
+    loaded = (dataset, opaque_model)
+
+
+# Runs one job in a pool worker. Returns the job and the error that stopped it, if any.
+def runJob(job):
+    dataset, configuration, seed = job
+    try:
+        settings = dict(DEFAULTS, **configuration)
+        load(dataset, settings['opaque_model'])
+        for name, value in settings.items():
+            setattr(run, name, value)
+        run.dataset_name = dataset
+        run.split_seed = SPLIT_SEED
+        run.experiment_seed = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            result, experiment_logbook, experiment_time, generations = run.runExperiment(seed)
+
+        record = dict(configuration=configuration,
+                      experiment=run.experimentRecord(seed, result, experiment_logbook, experiment_time),
+                      generations=list(evolution.flatRecords(generations)),
+                      pareto=results.paretoRows(result[7]))
+        path = resultPath(dataset, configuration, seed)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(record, f, default=results.jsonValue)
+        os.replace(path + '.tmp', path)
+        return job, None
+    except Exception:
+        return job, traceback.format_exc()
+
+
+# One row per dataset and configuration over the seeds with a result.
+def writeSummary(datasets, grid, seeds):
+    rows = []
+    for dataset in datasets:
+        for configuration in configurations(grid):
+            experiments = []
+            for seed in seeds:
+                if os.path.exists(resultPath(dataset, configuration, seed)):
+                    with open(resultPath(dataset, configuration, seed)) as f:
+                        experiments.append(json.load(f)['experiment'])
+            if not experiments:
+                continue
+            fscores = [experiment['gp_fscore'] for experiment in experiments]
+            rows.append(dict(dataset=dataset, configuration=configurationName(configuration), runs=len(experiments),
+                             gp_fscore_avg=statistics.mean(fscores), gp_fscore_std=statistics.pstdev(fscores),
+                             mlp_fscore=statistics.mean(experiment['mlp_fscore'] for experiment in experiments),
+                             gp_nodes_avg=statistics.mean(experiment['gp_nodes'] for experiment in experiments),
+                             seconds_avg=statistics.mean(experiment['seconds'] for experiment in experiments)))
+
+    path = os.path.join(RESULT_DIRECTORY, 'summary.csv')
+    os.makedirs(RESULT_DIRECTORY, exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, ['dataset', 'configuration', 'runs', 'gp_fscore_avg', 'gp_fscore_std',
+                                    'mlp_fscore', 'gp_nodes_avg', 'seconds_avg'])
+        writer.writeheader()
+        writer.writerows(rows)
+    print('Wrote ' + path)
+
+
+def main(workers=None):
+    jobs = pendingJobs(DATASETS, GRID, SEEDS)
+    print(str(len(jobs)) + ' of ' + str(len(DATASETS) * len(configurations(GRID)) * len(SEEDS)) + ' jobs to run')
+
+    prepared = set()
+    for dataset, opaque_model in dict.fromkeys((job[0], dict(DEFAULTS, **job[1])['opaque_model']) for job in jobs):
+        try:
+            prepare(dataset, opaque_model)
+            prepared.add((dataset, opaque_model))
+        except Exception as error:
+            print('Skipping ' + dataset + ' (' + opaque_model + '): ' + str(error))
+    jobs = [job for job in jobs if (job[0], dict(DEFAULTS, **job[1])['opaque_model']) in prepared]
+
+    start = perf_counter()
+    failed = 0
+    # Work stealing: one job at a time to whichever worker is idle
+    with multiprocessing.Pool(workers) as pool:
+        for done, ((dataset, configuration, seed), error) in enumerate(
+                pool.imap_unordered(runJob, jobs, chunksize=1), 1):
+            name = dataset + ' ' + configurationName(configuration) + ' seed ' + str(seed)
+            if error is not None:
+                failed += 1
+                print('Failed ' + name + ':\n' + error)
+            else:
+                print('[%d/%d %.0f s] %s' % (done, len(jobs), perf_counter() - start, name))
+    if failed:
+        print(str(failed) + ' jobs failed and will run again next time')
+    writeSummary(DATASETS, GRID, SEEDS)
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:2]])